@@ -1,10 +1,144 @@
 import itertools
+import threading
+import time
 import Player as base
 
+from ChessGame          import ChessGame
+from MoveOrdering       import MoveOrderer
+from ParallelSearch     import ParallelSearch
+from Search             import Search
+from TranspositionTable import TranspositionTable
+
 class AIPlayer(base.Player):
+    """
+    Computer player backed by Search.py
+        - @time_limit (seconds) and @node_limit bound the work done per move; either may be
+          None, but leaving both unset searches all the way to @max_depth
+        - one TranspositionTable of @table_mb megabytes and one MoveOrderer are kept for
+          the whole game
+        - @workers > 1 splits each search across that many processes (see
+          ParallelSearch.py); each worker then uses its own @table_mb table
+        - with @pondering, ponder() keeps searching on the opponent's time: the reply the
+          opponent is expected to make is guessed and the position after it searched in a
+          background thread until get_move is called. If the opponent made that reply
+          (a ponder hit) and the ponder search already had @time_limit seconds, its move is
+          played at once. On any other hit the search carries on in this process from the
+          table the ponder search filled, with the time already spent taken off its
+          budget, even when @workers > 1, since worker processes start from empty tables.
+          On a miss the normal search runs; with @workers > 1 it gains nothing from the
+          ponder search
+    """
+
+    def __init__(self, name, time_limit=1.0, node_limit=None, max_depth=64,
+                 table_mb=16, workers=1, pondering=False):
+        base.Player.__init__(self, name)
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth  = max_depth
+        self.table_mb   = table_mb
+        self.workers    = workers
+        self.pondering  = pondering
+        self.table      = TranspositionTable(table_mb)
+        self.orderer    = MoveOrderer()
+        self.last_search = None
+
+        self.ponder_hits   = 0
+        self.ponder_misses = 0
+        self._ponder_job   = None
+
+    def get_move(self, b, stop=None):
+        """
+        Search the ChessGame @b and return the chosen move as (at, to, promotion), where
+        promotion is None unless a pawn promotes
+            - return None if the side to move has no legal moves
+            - setting the threading Event @stop ends the search early, with the best move
+              found so far
+        """
+
+        time_limit = self.time_limit
+        workers    = self.workers
+        pondered   = self.stop_pondering()
+        if pondered and pondered[0] == b.position_key():
+            key, search, spent = pondered
+            self.ponder_hits += 1
+            if search.depth and (search.depth >= self.max_depth or
+                                 time_limit is not None and spent >= time_limit):
+                self.last_search = search
+                return self._unpack(search.best_move)
+            if time_limit is not None:
+                time_limit = max(time_limit - spent, time_limit / 4.0)
+            # only a search in this process can use what the ponder search put in the table
+            workers = 1
+        elif pondered:
+            self.ponder_misses += 1
+
+        search = ParallelSearch(b, workers, time_limit, self.node_limit,
+                                self.max_depth, self.table_mb, self.table,
+                                self.orderer, stop)
+        move   = search.run()
+        self.last_search = search
+        if move is None:
+            return None
+        return self._unpack(move)
+
+    @staticmethod
+    def _unpack(move):
+        at, to = ChessGame.decode_move(move)
+        return at, to, ChessGame.get_promotion(move)
+
+    def ponder(self, b):
+        """
+        Start pondering on the ChessGame @b, where the opponent is to move; @b itself is not
+        touched by the background thread
+        """
+
+        self.stop_pondering()
+        stop   = threading.Event()
+        state  = { 'key': None, 'search': None, 'started': time.time() }
+        thread = threading.Thread(target=self._ponder, args=(b.copy(), stop, state))
+        thread.daemon = True
+        self._ponder_job = thread, stop, state
+        thread.start()
+
+    def stop_pondering(self):
+        """
+        Stop the ponder search, if one is running
+            - return (position key searched, its Search, seconds spent), or None if there
+              was nothing to stop or no reply was guessed
+        """
+
+        if self._ponder_job is None:
+            return None
+
+        thread, stop, state = self._ponder_job
+        self._ponder_job = None
+        stop.set()
+        thread.join()
+        if state['search'] is None:
+            return None
+        return state['key'], state['search'], time.time() - state['started']
+
+    def _ponder(self, game, stop, state):
+        """
+        Body of the ponder thread: guess the opponent's reply in @game (a copy owned by
+        this thread) from the table or a shallow search, and search the position it leads
+        to until @stop is set
+        """
+
+        moves = game.generate_legal_moves()
+        if not moves:
+            return
 
-    def __init__(self, name):
-        base.__init__(self, name)
+        entry = self.table.probe(game.position_key())
+        reply = entry[3] if entry and entry[3] in moves else None
+        if reply is None:
+            reply = Search(game, max_depth=2, table=self.table, orderer=self.orderer,
+                           stop=stop).run()
+        if stop.is_set():
+            return
 
-    def get_move(self, b):
-        return NotImplemented()
+        game.push_move(reply)
+        search = Search(game, None, None, self.max_depth, self.table, self.orderer,
+                        stop=stop)
+        state['key'], state['search'] = game.position_key(), search
+        search.run()
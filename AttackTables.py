@@ -0,0 +1,158 @@
+"""
+Move and attack tables used by ChessGame.py. Everything here is built once at import
+    - squares are indexed as in Bitboards.py (8*x + y)
+    - directions use the same compass names ChessGame has always used: 'up' decreases x,
+      'right' increases y, and 'd1' through 'd4' are the diagonals
+    - RAYS[direc][sq] lists the squares reached from sq walking in direc, nearest first;
+      RAY_MASKS[direc][sq] is the same set as a bitboard
+    - KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS and PAWN_PUSHES are bitboards per square
+    - BETWEEN[a][b] holds the squares strictly between two aligned squares (empty otherwise)
+    - CASTLES, CASTLING_KEPT and CASTLE_ROOKS describe castling; castling rights are a 4 bit
+      mask (1, 2 for white's king and queen side, 4, 8 for black's)
+"""
+
+import Bitboards as bits
+
+COMPASS = {
+    'up'    : (-1,  0),
+    'down'  : ( 1,  0),
+    'left'  : ( 0, -1),
+    'right' : ( 0,  1),
+    'd1'    : (-1,  1),
+    'd2'    : ( 1, -1),
+    'd3'    : ( 1,  1),
+    'd4'    : (-1, -1)
+}
+
+ROOK_DIRECTIONS   = ('up', 'down', 'left', 'right')
+BISHOP_DIRECTIONS = ('d1', 'd2', 'd3', 'd4')
+
+# walking in these directions increases the square index, so the nearest blocker on a
+# ray is its lowest set square; in the others it is the highest
+INCREASING = frozenset(direc for direc, (dx, dy) in COMPASS.items()
+                       if 8 * dx + dy > 0)
+
+KNIGHT_OFFSETS = ((-1, -2), (-2, -1), (-2, 1), (-1, 2),
+                  (1, 2), (2, 1), (1, -2), (2, -1))
+KING_OFFSETS   = tuple(COMPASS.values())
+
+# white pawns advance towards increasing x, black pawns towards decreasing x
+PAWN_DIRECTION = { 'white': 1, 'black': -1 }
+
+def _in_bounds(x, y):
+    return 0 <= x < 8 and 0 <= y < 8
+
+def _ray(sq, direc):
+    x, y   = bits.coords(sq)
+    dx, dy = COMPASS[direc]
+    squares = []
+    x, y = x + dx, y + dy
+    while _in_bounds(x, y):
+        squares.append(bits.square(x, y))
+        x, y = x + dx, y + dy
+    return squares
+
+def _jumps(sq, offsets):
+    x, y = bits.coords(sq)
+    mask = bits.EMPTY
+    for dx, dy in offsets:
+        if _in_bounds(x + dx, y + dy):
+            mask |= bits.bit(bits.square(x + dx, y + dy))
+    return mask
+
+def _to_mask(squares):
+    mask = bits.EMPTY
+    for sq in squares:
+        mask |= bits.bit(sq)
+    return mask
+
+RAYS = { direc: [_ray(sq, direc) for sq in range(64)] for direc in COMPASS }
+RAY_MASKS = { direc: [_to_mask(ray) for ray in rays]
+              for direc, rays in RAYS.items() }
+
+BETWEEN = [[bits.EMPTY] * 64 for sq in range(64)]
+for sq in range(64):
+    for direc in COMPASS:
+        for i, to in enumerate(RAYS[direc][sq]):
+            BETWEEN[sq][to] = _to_mask(RAYS[direc][sq][:i])
+
+KNIGHT_ATTACKS = [_jumps(sq, KNIGHT_OFFSETS) for sq in range(64)]
+KING_ATTACKS   = [_jumps(sq, KING_OFFSETS) for sq in range(64)]
+
+PAWN_ATTACKS = { color: [_jumps(sq, ((dx, -1), (dx, 1))) for sq in range(64)]
+                 for color, dx in PAWN_DIRECTION.items() }
+PAWN_PUSHES  = { color: [_jumps(sq, ((dx, 0), )) for sq in range(64)]
+                 for color, dx in PAWN_DIRECTION.items() }
+
+# pawns on their starting row may advance two squares if both are empty
+PAWN_START_ROW = { 'white': 1, 'black': 6 }
+PAWN_DOUBLE_PUSHES = { color: [_jumps(sq, ((2 * dx, 0), ))
+                               if bits.coords(sq)[0] == PAWN_START_ROW[color] else
+                               bits.EMPTY for sq in range(64)]
+                       for color, dx in PAWN_DIRECTION.items() }
+
+# a pawn reaching either end row promotes
+LAST_ROWS = _to_mask(list(range(8)) + list(range(56, 64)))
+
+# per color: (right, king from, king to, rook from, rook to, squares that must be empty,
+# squares the king may not be attacked on)
+ALL_CASTLING = 15
+CASTLES = {
+    'white': ((1,  4,  6,  7,  5, _to_mask((5, 6)),        (4, 5, 6)),
+              (2,  4,  2,  0,  3, _to_mask((1, 2, 3)),     (4, 3, 2))),
+    'black': ((4, 60, 62, 63, 61, _to_mask((61, 62)),      (60, 61, 62)),
+              (8, 60, 58, 56, 59, _to_mask((57, 58, 59)), (60, 59, 58)))
+}
+
+# CASTLING_KEPT[sq] holds the rights that survive a move from or to sq;
+# CASTLE_ROOKS[king to] holds the rook's (from, to) for each castle
+CASTLING_KEPT = [ALL_CASTLING] * 64
+CASTLE_ROOKS  = dict()
+for castles in CASTLES.values():
+    for right, king_from, king_to, rook_from, rook_to, empty, safe in castles:
+        CASTLING_KEPT[king_from] &= ~right
+        CASTLING_KEPT[rook_from] &= ~right
+        CASTLE_ROOKS[king_to] = (rook_from, rook_to)
+
+def nearest(direc, blockers):
+    """
+    The square of non-empty @blockers met first when walking a ray in @direc
+    """
+    if direc in INCREASING:
+        return bits.lsb(blockers)
+    return bits.msb(blockers)
+
+def ray_attacks(sq, occupied, direc):
+    """
+    Squares attacked from @sq along @direc, up to and including the first occupied one
+    """
+    mask     = RAY_MASKS[direc][sq]
+    blockers = mask & occupied
+    if not blockers:
+        return mask
+
+    return mask ^ RAY_MASKS[direc][nearest(direc, blockers)]
+
+def rook_attacks(sq, occupied):
+    return (ray_attacks(sq, occupied, 'up')   | ray_attacks(sq, occupied, 'down') |
+            ray_attacks(sq, occupied, 'left') | ray_attacks(sq, occupied, 'right'))
+
+def bishop_attacks(sq, occupied):
+    return (ray_attacks(sq, occupied, 'd1') | ray_attacks(sq, occupied, 'd2') |
+            ray_attacks(sq, occupied, 'd3') | ray_attacks(sq, occupied, 'd4'))
+
+def piece_attacks(name, sq, occupied):
+    """
+    Squares attacked by a non-pawn piece called @name standing on @sq
+    """
+    if name == 'knight':
+        return KNIGHT_ATTACKS[sq]
+    elif name == 'king':
+        return KING_ATTACKS[sq]
+    elif name == 'bishop':
+        return bishop_attacks(sq, occupied)
+    elif name == 'rook':
+        return rook_attacks(sq, occupied)
+    elif name == 'queen':
+        return bishop_attacks(sq, occupied) | rook_attacks(sq, occupied)
+    raise ValueError(name)
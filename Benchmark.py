@@ -0,0 +1,136 @@
+"""
+Benchmarks for the AI search
+    - run with: python Benchmark.py [depth] [archive.pgn]
+    - positions are given as FEN
+    - PGN replay speed is measured on the given archive, or on a generated one of
+      random games
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import PGN
+from ChessGame          import ChessGame
+from Search             import Search
+from TranspositionTable import TranspositionTable
+
+POSITIONS = [
+    ('initial',     'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'),
+    ('open centre', 'r1bqkb1r/ppp2ppp/2nppn2/8/8/2NPPN2/PPP2PPP/R1BQKB1R w KQkq - 4 5'),
+    ('queen raid',  'rnbqkbnr/2pp1ppp/pp2p3/8/2B5/4PQ2/PPPP1PPP/RNB1K1NR w KQkq - 0 4'),
+]
+
+def nodes_to_depth(depth):
+    """
+    Nodes and time for a fixed depth search of each position, with and without move
+    ordering
+    """
+
+    print('nodes to depth {depth}'.format(depth=depth))
+    totals = { False: 0, True: 0 }
+    for name, fen in POSITIONS:
+        for ordering in (False, True):
+            search = Search(ChessGame.from_fen(fen), max_depth=depth,
+                            table=TranspositionTable(), ordering=ordering)
+            start = time.time()
+            search.run()
+            elapsed = time.time() - start
+            totals[ordering] += search.nodes
+
+            print('  {name:<12} {mode:<10} {nodes:>9} nodes ({qnodes:>8} quiescence) '
+                  '{secs:7.2f}s'.format(
+                      name=name, mode='ordered' if ordering else 'unordered',
+                      nodes=search.nodes, qnodes=search.qnodes, secs=elapsed))
+
+    print('  total nodes: {before} unordered, {after} ordered'.format(
+        before=totals[False], after=totals[True]))
+
+def selectivity(depth):
+    """
+    Nodes, time to depth and effective branching factor (the geometric mean growth in
+    nodes per extra ply of iterative deepening) with null-move pruning and late move reductions
+    switched on and off
+    """
+
+    print('selective search to depth {depth}'.format(depth=depth))
+    for label, null_move, reductions in [('plain', False, False), ('null move', True, False),
+                                         ('lmr', False, True), ('both', True, True)]:
+        nodes, elapsed, factors = 0, 0.0, []
+        for name, fen in POSITIONS:
+            search = Search(ChessGame.from_fen(fen), max_depth=depth,
+                            table=TranspositionTable(), null_move=null_move,
+                            late_move_reductions=reductions)
+            counts = [0]
+            search.report = lambda depth, score, move: counts.append(search.nodes)
+            start = time.time()
+            search.run()
+            elapsed += time.time() - start
+            nodes   += search.nodes
+
+            if len(counts) > 2 and counts[1]:
+                first, last = counts[1], counts[-1] - counts[-2]
+                factors.append((float(last) / first) ** (1.0 / (len(counts) - 2)))
+
+        print('  {label:<10} {nodes:>9} nodes {secs:7.2f}s  branching factor {ebf:5.2f}'.format(
+            label=label, nodes=nodes, secs=elapsed,
+            ebf=sum(factors) / len(factors) if factors else 0.0))
+
+def random_archive(path, games=200, plies=120, seed=1):
+    """
+    Write @games games of up to @plies random legal moves to the PGN file @path
+    """
+
+    rng = random.Random(seed)
+    with open(path, 'w') as out:
+        for number in range(games):
+            game, moves = ChessGame(), []
+            for ply in range(plies):
+                legal = game.generate_legal_moves()
+                if not legal:
+                    break
+                moves.append(rng.choice(legal))
+                game.push_move(moves[-1])
+            PGN.write_game(out, moves, { 'Event': 'benchmark', 'Round': number + 1 })
+
+def pgn_replay(path=None):
+    """
+    Games and plies per second when reading (and so replaying) the PGN archive at @path
+    """
+
+    generated = path is None
+    if generated:
+        handle, path = tempfile.mkstemp(suffix='.pgn')
+        os.close(handle)
+        start = time.time()
+        random_archive(path)
+        print('wrote random archive in {secs:.2f}s'.format(secs=time.time() - start))
+
+    try:
+        games = plies = 0
+        start = time.time()
+        for game in PGN.read_games(path):
+            games += 1
+            plies += len(game.moves)
+        elapsed = max(time.time() - start, 1e-6)
+    finally:
+        if generated:
+            os.remove(path)
+
+    print('pgn replay: {games} games, {plies} plies in {secs:.2f}s: '
+          '{rate:.1f} games/s, {prate:.0f} plies/s'.format(
+              games=games, plies=plies, secs=elapsed, rate=games / elapsed,
+              prate=plies / elapsed))
+
+def main(argv):
+    depth = int(argv[1]) if len(argv) > 1 else 4
+    nodes_to_depth(depth)
+    selectivity(depth)
+    pgn_replay(argv[2] if len(argv) > 2 else None)
+
+if __name__ == '__main__':
+    main(sys.argv)
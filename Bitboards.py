@@ -0,0 +1,53 @@
+"""
+Helpers for the 64-bit board sets used by ChessGame.py
+    - a square (x, y) has index 8*x + y; x is the row and y is the column
+    - bit i of a bitboard is set when square i belongs to the set
+"""
+
+EMPTY = 0
+FULL  = (1 << 64) - 1
+
+def square(x, y):
+    """
+    Get the square index of board location (x, y)
+    """
+    return (x << 3) | y
+
+def coords(sq):
+    """
+    Get the board location (x, y) of square index @sq
+    """
+    return sq >> 3, sq & 7
+
+def bit(sq):
+    """
+    Get the bitboard holding only square @sq
+    """
+    return 1 << sq
+
+def lsb(bb):
+    """
+    Index of the lowest set square of a non-empty bitboard
+    """
+    return (bb & -bb).bit_length() - 1
+
+def msb(bb):
+    """
+    Index of the highest set square of a non-empty bitboard
+    """
+    return bb.bit_length() - 1
+
+def popcount(bb):
+    """
+    Number of squares in @bb
+    """
+    return bin(bb).count('1')
+
+def iter_squares(bb):
+    """
+    Yield the square indices of @bb from lowest to highest
+    """
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
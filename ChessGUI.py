@@ -2,6 +2,7 @@ import itertools
 import collections
 import Queue
 import os
+import threading
 
 from Tkinter     import *
 from ChessGame   import *
@@ -14,6 +15,11 @@ class ChessGui:
         - @p1 can be None if running GameClient
         - @socket and @queue are used by GameClient.py and GameServer.py only
         - Logic should be handled entirely by ChessGame.py
+        - AI moves are searched on a worker thread and come back through a queue drained
+          by process_incoming, so the window stays responsive while the AI thinks
+        - drawing is deferred: refreshes only mark squares and the status as dirty, and
+          everything dirty is drawn once when Tk goes idle. render_counter counts frames
+          drawn and the square and status widgets actually reconfigured
 
     TODO: Try to implement gui with grid geometry manager as oppose to absolute positioning
           Also add ability to play again
@@ -31,6 +37,9 @@ class ChessGui:
         self.queue  = queue
         self._init_board()
 
+    # milliseconds between checks for an AI move while one is being searched
+    AI_POLL = 50
+
     def _init_board(self):
         self.box_size     = 60
         self.gap_size     = 10
@@ -45,40 +54,83 @@ class ChessGui:
         self.waiting      = self.p1 is None
         self._highlighted = set()
         self._label_dict  = { }
+        self._drawn       = { }
+        self._sprites     = { }
+        self._ai_moves    = Queue.Queue()
+        self._thinking    = None
+        self._polling     = False
+        self._cancel      = threading.Event()
+
+        self._dirty          = { }
+        self._dirty_status   = False
+        self._status         = None
+        self._status_label   = None
+        self._frame_queued   = False
+        self.render_counter  = collections.Counter()
         self._refresh_board()
 
+        # an AI playing white moves without waiting for a click
+        self.root.after_idle(self._advance_turn)
+
     def process_incoming(self):
         """
-        Used to handle incoming move requests from socket
-            - Only used by GameClient.py and GameServer.py
-            - moves must be put in queue as ((x,y), (u,v))
+        Used to handle incoming move requests from socket and finished AI searches
+            - the socket queue is only used by GameClient.py and GameServer.py
+            - moves must be put in queue as (move, key): the move encoding (see
+              ChessGame.encode_move) and the position key the sender reached with it. A key
+              that differs from ours means the boards no longer agree, and play stops
+            - AI moves arrive as (request, (at, to, promotion)); only the latest request's
+              move is made
         """
 
+        while self._ai_moves.qsize():
+            request, move = self._ai_moves.get(0)
+            if request is self._thinking:
+                self._thinking = None
+                if move:
+                    at, to, promotion = move
+                    self._make_move(at, to, promotion or 'queen')
+                elif self.playing:
+                    # the search failed; stop instead of waiting for a move that won't come
+                    self.playing = False
+                    self._refresh_status('magenta')
+
         if not self.queue:
             return
 
         while self.queue.qsize():
-            at, to = self.queue.get(0)
-            self._make_move(at, to)
+            move, key = self.queue.get(0)
+            at, to    = ChessGame.decode_move(move)
+            self._make_move(at, to, ChessGame.get_promotion(move) or 'queen', remote=True)
             self.waiting = False
+            if self.game.position_key() != key:
+                self.playing = False
+                self._refresh_status('orange')
 
     def _advance_turn(self):
         """
         Update status based on the state of the board 
             - only HumanPlayers should be moved by clicks on the board (None implies move will come from P2P socket)
+            - status() builds the turn's legal move map, so clicks during the turn are lookups
         """
 
-        if self.game.has_winner():
-            self.playing = False 
+        status = self.game.status()
+        if status.game_over:
+            self.playing = False
+            self._stop_pondering()
 
-        color, player = self.game.get_turn(), self.p1
+        color, player, waiting = status.turn, self.p1, self.p2
         if color != ChessGame.WHITE:
-            player = self.p2
+            player, waiting = self.p2, self.p1
 
-        if self.p1 is not None and not isinstance(player, HumanPlayer):
-            at, to = player.get_move()
+        if (self.playing and self.p1 is not None and
+            not isinstance(player, HumanPlayer)):
+            self._request_move(player)
+        elif self.playing and getattr(waiting, 'pondering', False):
+            # an AI waiting on a human (or a remote move from process_incoming) thinks ahead
+            waiting.ponder(self.game)
 
-        if self.game.color_in_check(color):
+        if status.in_check:
             self._refresh_status('red')
         else:
             self._refresh_status(None)
@@ -86,25 +138,58 @@ class ChessGui:
         self.selected_piece = None
         self._clear_highlighted()
 
-    def _make_move(self, at, to):
+    def _request_move(self, player):
+        """
+        Start @player searching for its move on a worker thread, over a copy of the game
+            - the move is put on _ai_moves and made by process_incoming; polling runs every
+              AI_POLL ms until it arrives, since local games have no socket loop to drive it
+            - if get_move raises, None is put on _ai_moves instead, so the board does not
+              wait for it forever
+        """
+
+        request = self._thinking = object()
+        game    = self.game.copy()
+
+        def think():
+            move = None
+            try:
+                move = player.get_move(game, self._cancel)
+            finally:
+                self._ai_moves.put((request, move))
+
+        thread = threading.Thread(target=think)
+        thread.daemon = True
+        thread.start()
+
+        if not self._polling:
+            self._polling = True
+            self.root.after(ChessGui.AI_POLL, self._poll_ai)
+
+    def _poll_ai(self):
+        self.process_incoming()
+        if self._thinking is not None and not self._cancel.is_set():
+            self.root.after(ChessGui.AI_POLL, self._poll_ai)
+        else:
+            self._polling = False
+
+    def _make_move(self, at, to, promotion='queen', remote=False):
         """
         Use to update UI elements after call to move method in ChessGame
+            - moves made here are sent to the other player, unless they came from it
+              (@remote)
         """
 
         if not at or not to:
             return False
 
-        x, y = at
-        u, v = to
-
-        made, _ = self.game.make_move(at, to)
+        made, _ = self.game.make_move(at, to, promotion)
         if made:
             self._advance_turn()
-            self._refresh_square(x, y)
-            self._refresh_square(u, v)
+            for u, v in self.game.last_move_squares():
+                self._refresh_square(u, v)
 
-            if self.socket:
-                self.socket.send_move(at, to)
+            if self.socket and not remote:
+                self.socket.send_move(self.game.last_move(), self.game.position_key())
                 self.waiting = True
         else:
             self._refresh_status('yellow')
@@ -118,7 +203,7 @@ class ChessGui:
             - P2P game is only available for HumanPlayer/HumanPlayer play
         """
 
-        if not self.playing:
+        if not self.playing or self._thinking is not None:
             return
 
         if self.socket:
@@ -185,11 +270,78 @@ class ChessGui:
         """
         Player color should be text color of status label. If user tries to make a move that
         would set him/her in check, display YELLOW background. If user gets put in check by
-        opponent, display RED background
+        opponent, display RED background. If the networked boards fall out of sync, display
+        ORANGE background, and if the AI fails to produce a move, MAGENTA
+            - the label is redrawn with the next frame (see _schedule_render)
 
         TODO: implement status updates/replay game option when game is over
         """
 
+        self._status, self._dirty_status = status, True
+        self._clear_highlighted()
+        self._schedule_render()
+
+    def _refresh_square(self, i, j, color=None):
+        """
+        Tkinter slows down considerably if we redraw the board each time. Make changes only to
+        cell specified at row = i, col = j
+            - the square is only marked dirty here; the last color asked for before the
+              next frame is the one drawn
+        """
+
+        if color:
+            self._highlighted.add((i, j))
+        self._dirty[i, j] = color
+        self._schedule_render()
+
+    def _schedule_render(self):
+        """
+        Ask Tk to draw everything dirty once it has handled the current event
+        """
+
+        if not self._frame_queued:
+            self._frame_queued = True
+            self.root.after_idle(self._render)
+
+    def _render(self):
+        """
+        Draw one frame: each dirty square and, if it changed, the status label
+        """
+
+        self._frame_queued = False
+        self.render_counter['frames'] += 1
+
+        dirty, self._dirty = self._dirty, { }
+        for (i, j), color in dirty.items():
+            self._draw_square(i, j, color)
+
+        if self._dirty_status:
+            self._dirty_status = False
+            self._draw_status()
+
+    def _draw_square(self, i, j, color=None):
+        """
+        Show the piece on (i, j) over @color, or the square's own color
+            - each square keeps one label for the whole game; only its image and background
+              are changed, and only when they differ from what it already shows
+        """
+
+        if not color:
+            color = 'blue' if (i+j) % 2 == 0 else 'gray'
+
+        piece  = self.game.get_piece(i, j)
+        sprite = (piece.color, piece.name) if piece else None
+        if self._drawn.get((i, j)) != (sprite, color):
+            self._drawn[i, j] = sprite, color
+            self._label_dict[i, j].config(image=self._sprites[sprite] if sprite else '',
+                                          bg=color)
+            self.render_counter['squares'] += 1
+
+    def _draw_status(self):
+        """
+        Show whose move it is in the status label, created on first use
+        """
+
         background = ChessGame.BLACK
         foreground = ChessGame.WHITE
         turn_color = self.game.get_turn()
@@ -197,67 +349,70 @@ class ChessGui:
         if turn_color == ChessGame.WHITE:
             foreground, background = ChessGame.BLACK, ChessGame.WHITE
 
-        label = ChessPiece(row=None, col=None, text='move ' + turn_color,
-                           master=self.canvas, bg=background, fg=foreground)
-        label.place(x=240, y=600, width=100)
+        if self._status_label is None:
+            self._status_label = ChessPiece(row=None, col=None, master=self.canvas)
+            self._status_label.place(x=240, y=600, width=100)
 
-        self._clear_highlighted()
-        self.root.update()
-        return
+        shown = ('move ' + turn_color, self._status or background, foreground)
+        if self._drawn.get('status') != shown:
+            self._drawn['status'] = shown
+            self._status_label.config(text=shown[0], bg=shown[1], fg=shown[2])
+            self.render_counter['status'] += 1
 
-    def _refresh_square(self, i, j, color=None):
+    def _load_sprites(self):
         """
-        Tkinter slows down considerably if we redraw the board each time. Make changes only to
-        cell specified at row = i, col = j
+        Decode each piece image once; every square showing that piece shares it
             - all images must be .gifs and be saved as COLOR_PIECENAME
             - e.g. white_knight.gif
         """
 
-        if not color:
-            color = 'blue' if (i+j) % 2 == 0 else 'gray'
-        else:
-            self._highlighted.add((i, j))
-
-        top, left  = self._top_left(i, j)
-        label = ChessPiece(row=i, col=j, master=self.canvas, bg=color)
-        label.bind('<Button-1>', self._on_board_click)
-
-        piece = self.game.get_piece(i, j)
-        if piece:
-
+        for color, name in itertools.product(ChessGame.COLORS, ChessGame.NAMES):
             path = os.path.join('GIFChessPieces', '{color}_{name}.gif'.format(
-                color=piece.color, name=piece.name))
-            img   = PhotoImage(file=path)
-            label.config(image=img)
-            label.image = img
+                color=color, name=name))
+            self._sprites[color, name] = PhotoImage(file=path)
 
-        if (i, j) in self._label_dict:
-            self.canvas.delete(self._label_dict[i, j])
-        self._label_dict[i, j] = label
+    def _create_squares(self):
+        """
+        Create and place the label for each square, once
+        """
 
-        label.place(x=top, y=left, height=self.box_size, width=self.box_size)
+        for i, j in itertools.product(range(8), range(8)):
+            top, left = self._top_left(i, j)
+            label = ChessPiece(row=i, col=j, master=self.canvas)
+            label.bind('<Button-1>', self._on_board_click)
+            label.place(x=top, y=left, height=self.box_size, width=self.box_size)
+            self._label_dict[i, j] = label
         self.canvas.pack(fill=BOTH, expand=1)
 
     def _refresh_board(self):
         """
         Use this method to redraw the board based on the positions managed by ChessGame.py
-        Note that everytime this method is called, a call to self.canvas.update_idletasks() should also be made (canvas loses focus)
+            - the canvas, sprites and square labels are created on the first call only
         """
 
         self.selected_piece = None
-        if self.canvas:
-            self.canvas.delete('all')
-        else:
+        if not self.canvas:
             self.canvas = Canvas(self.root)
+            self._load_sprites()
+            self._create_squares()
 
         for i, j in itertools.product(range(8), range(8)):
             self._refresh_square(i, j)
         self._refresh_status(None)
 
+    def _stop_pondering(self):
+        for player in (self.p1, self.p2):
+            if getattr(player, 'pondering', False):
+                player.stop_pondering()
+
     def on_window_close(self):
         """
-        Close any open connections and destroy Tk root
+        Cancel any AI search, close any open connections, stop any AI pondering and destroy
+        Tk root
         """
+        self._cancel.set()
+        self._thinking = None
+        self._stop_pondering()
         if self.socket:
             self.socket.close()
 
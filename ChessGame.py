@@ -1,19 +1,33 @@
 import collections, itertools, random
+import Bitboards as bits
+import AttackTables as tables
+import Evaluation
+import Zobrist
+from GameStatus import GameStatus
+from Position import Position
 
 class ChessGame:
     """
     Controller class to be used with ChessGUI.py. All logic for chess game
     should be implemented here.
 
-    TODO: implement castling and en passant in _get_piece_moves. Pawns also need to
-          be able to move two spots at the beginning of the game
-          and be traded for highest value piece if they make it to other side
-
     """
 
-    BLACK = 'black'
-    WHITE = 'white'
-    Piece = collections.namedtuple('Piece', ['name', 'color'])
+    BLACK   = 'black'
+    WHITE   = 'white'
+    COLORS  = (WHITE, BLACK)
+    NAMES   = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+    LETTERS = { 'pawn': 'p', 'knight': 'n', 'bishop': 'b', 'rook': 'r', 'queen': 'q',
+                'king': 'k' }
+    Piece   = collections.namedtuple('Piece', ['name', 'color'])
+
+    # promotion piece stored in bits 12-15 of a move encoding
+    PROMOTIONS = (None, 'knight', 'bishop', 'rook', 'queen')
+
+    NAMES_BY_LETTER = { letter: name for name, letter in LETTERS.items() }
+
+    # positions whose GameStatus is remembered, least recently used dropped first
+    STATUS_CACHE_SIZE = 64
 
     def __init__(self):
         """
@@ -21,37 +35,328 @@ class ChessGame:
         """
 
         self.__turn_info  = { 'turn': ChessGame.WHITE }
+        self.__check_every = 0
+        self.__checks      = 0
+        self.__statuses    = collections.OrderedDict()
+        self.__move_map    = (None, None, 0)
         self.init_board()
 
     def init_board(self):
         """
-        Maintain game board as a dict and keep location of player pieces in sets
-        No top level classes should have access to self.__board
+        Maintain game board as bitboards: one 64-bit int per (color, piece name) plus an
+        occupancy mask per color. A 64 entry list mirrors the bitboards so that single
+        square lookups stay O(1)
+        No top level classes should have access to self.__bitboards or self.__squares
         """
 
-        self.__board = dict()
+        self._clear_board()
         order  = ['rook', 'knight', 'bishop', 'queen', 'king', 'bishop',
                   'knight', 'rook']
         for j, name in enumerate(order):
 
-            self.__board[(0, j)] = ChessGame.Piece( name,  ChessGame.WHITE)
-            self.__board[(7, j)] = ChessGame.Piece( name,  ChessGame.BLACK)
-            self.__board[(1, j)] = ChessGame.Piece('pawn', ChessGame.WHITE)
-            self.__board[(6, j)] = ChessGame.Piece('pawn', ChessGame.BLACK)
-
-        self.__players = { ChessGame.WHITE: set(), ChessGame.BLACK: set() }
-        for color in (ChessGame.BLACK, ChessGame.WHITE):
-            self.__players[color] = {(x, y) for (x, y), piece in
-                self.__board.iteritems() if piece.color == color }
+            self._put_piece(bits.square(0, j), ChessGame.Piece( name,  ChessGame.WHITE))
+            self._put_piece(bits.square(7, j), ChessGame.Piece( name,  ChessGame.BLACK))
+            self._put_piece(bits.square(1, j), ChessGame.Piece('pawn', ChessGame.WHITE))
+            self._put_piece(bits.square(6, j), ChessGame.Piece('pawn', ChessGame.BLACK))
 
+        self._set_castling(tables.ALL_CASTLING)
         return
 
+    def _clear_board(self):
+        """
+        Remove every piece and reset everything derived from the board; for internal use only
+        """
+
+        self.__bitboards = { color: dict.fromkeys(ChessGame.NAMES, bits.EMPTY)
+                             for color in ChessGame.COLORS }
+        self.__occupied  = dict.fromkeys(ChessGame.COLORS, bits.EMPTY)
+        self.__squares   = [None] * 64
+        self.__key       = Zobrist.SIDE if self.get_turn() == ChessGame.BLACK else 0
+        self.__key      ^= Zobrist.CASTLING[0]
+        self.__castling  = 0
+        self.__en_passant = None
+        self.__pushed    = []
+        self.__undone    = []
+        self.__keys      = []
+        self.__nulls     = []
+        self.__halfmoves = 0
+        self.__fullmoves = 1
+        self.__mg        = 0
+        self.__eg        = 0
+        self.__phase     = 0
+
+    def snapshot(self):
+        """
+        Get the position as an immutable, hashable and picklable Position (see Position.py)
+            - the move history is not included
+        """
+
+        letters = []
+        for piece in self.__squares:
+            if piece is None:
+                letters.append('.')
+            elif piece.color == ChessGame.WHITE:
+                letters.append(ChessGame.LETTERS[piece.name].upper())
+            else:
+                letters.append(ChessGame.LETTERS[piece.name])
+        return Position(''.join(letters), self.get_turn(), self.__castling,
+                        self.__en_passant, self.__halfmoves, self.__fullmoves, self.__key)
+
+    def restore(self, position, keys=()):
+        """
+        Replace the position with @position, as returned by snapshot
+            - the move history is cleared; @keys, the position keys of earlier positions
+              (see recent_keys), are kept so that repetitions are still recognised
+            - raise ValueError if @position does not describe a valid board
+        """
+
+        self._load_board(position.board, position.turn)
+        self._set_castling(position.castling)
+        self._set_en_passant(position.en_passant)
+        self.__halfmoves = position.halfmoves
+        self.__fullmoves = position.fullmoves
+        self.__keys      = list(keys)
+        if self.__key != position.key:
+            raise ValueError('position key does not match its board: {0!r}'.format(position))
+
+    def recent_keys(self):
+        """
+        Get the position keys of the earlier positions the current one can still repeat
+        (those since the last capture or pawn move), oldest first; see restore
+        """
+
+        return self.__keys[max(len(self.__keys) - self.__halfmoves, 0):]
+
+    def copy(self):
+        """
+        Get an independent game in the same position, for searching in another thread
+            - the position keys of earlier moves are copied so that repetitions are still
+              recognised; the undo stack is not
+        """
+
+        game = ChessGame()
+        game.restore(self.snapshot(), self.__keys)
+        return game
+
+    def _load_board(self, board, turn):
+        """
+        Clear the board and set it up from a 64 character string of piece letters by square
+        index, with @turn to move; for internal use only
+        """
+
+        if len(board) != 64 or turn not in ChessGame.COLORS:
+            raise ValueError('bad board: {0!r}, {1!r}'.format(board, turn))
+
+        self.__turn_info['turn'] = turn
+        self._clear_board()
+        for sq, letter in enumerate(board):
+            if letter == '.':
+                continue
+            color = ChessGame.WHITE if letter.isupper() else ChessGame.BLACK
+            name  = ChessGame.NAMES_BY_LETTER[letter.lower()]
+            self._put_piece(sq, ChessGame.Piece(name, color))
+
+    def _put_piece(self, sq, piece):
+        """
+        Place @piece on the empty square @sq; for internal use only
+        """
+
+        mask = bits.bit(sq)
+        self.__bitboards[piece.color][piece.name] |= mask
+        self.__occupied[piece.color] |= mask
+        self.__squares[sq] = piece
+        self.__key ^= Zobrist.PIECES[piece.color][piece.name][sq]
+        self.__mg += Evaluation.MG[piece.color][piece.name][sq]
+        self.__eg += Evaluation.EG[piece.color][piece.name][sq]
+        self.__phase += Evaluation.PHASE[piece.name]
+
+    def _remove_piece(self, sq):
+        """
+        Remove and return the piece on square @sq; for internal use only
+        """
+
+        piece = self.__squares[sq]
+        mask  = bits.bit(sq)
+        self.__bitboards[piece.color][piece.name] ^= mask
+        self.__occupied[piece.color] ^= mask
+        self.__squares[sq] = None
+        self.__key ^= Zobrist.PIECES[piece.color][piece.name][sq]
+        self.__mg -= Evaluation.MG[piece.color][piece.name][sq]
+        self.__eg -= Evaluation.EG[piece.color][piece.name][sq]
+        self.__phase -= Evaluation.PHASE[piece.name]
+        return piece
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        Create a game from a FEN string (see set_fen)
+        """
+
+        game = cls()
+        game.set_fen(fen)
+        return game
+
+    def set_fen(self, fen):
+        """
+        Replace the position with the one described by the FEN string @fen
+            - the halfmove clock and fullmove number may be left off, as in EPD
+            - castling rights whose king or rook is not on its home square are dropped, and
+              an en passant square is only kept if a pawn can actually capture onto it
+            - raise ValueError for a malformed FEN, one without exactly one king a side, one
+              where the side that has just moved is still in check, or one whose en passant
+              square could not follow a two square pawn push; the game is left as it was
+        """
+
+        fields = fen.split()
+        if len(fields) not in (4, 6):
+            raise ValueError('FEN needs 4 or 6 fields: {0!r}'.format(fen))
+
+        placement, turn, castling, en_passant = fields[:4]
+        rows = placement.split('/')
+        if len(rows) != 8 or turn not in ('w', 'b'):
+            raise ValueError('bad FEN: {0!r}'.format(fen))
+
+        board = []
+        for row in reversed(rows):
+            squares = ''
+            for letter in row:
+                if letter.isdigit():
+                    squares += '.' * int(letter)
+                elif letter.lower() in ChessGame.NAMES_BY_LETTER:
+                    squares += letter
+                else:
+                    raise ValueError('bad FEN piece {0!r}: {1!r}'.format(letter, fen))
+            if len(squares) != 8:
+                raise ValueError('bad FEN row {0!r}: {1!r}'.format(row, fen))
+            board.append(squares)
+        board = ''.join(board)
+
+        if board.count('K') != 1 or board.count('k') != 1:
+            raise ValueError('FEN needs one king a side: {0!r}'.format(fen))
+
+        rights = 0
+        for letter, castle in zip('KQkq', tables.CASTLES['white'] + tables.CASTLES['black']):
+            right, king_from, king_to, rook_from = castle[:4]
+            king = 'K' if letter.isupper() else 'k'
+            rook = 'R' if letter.isupper() else 'r'
+            if (letter in castling and board[king_from] == king and
+                board[rook_from] == rook):
+                rights |= right
+
+        target = None
+        if en_passant != '-':
+            # the square a pawn of the side not to move skipped: empty, as is the square
+            # it came from, with the pawn on the square in front
+            rank = '6' if turn == 'w' else '3'
+            if (len(en_passant) != 2 or en_passant[0] not in 'abcdefgh' or
+                en_passant[1] != rank):
+                raise ValueError('bad FEN en passant square: {0!r}'.format(fen))
+            target = bits.square(int(rank) - 1, 'abcdefgh'.index(en_passant[0]))
+            ahead, behind = (-8, 8) if turn == 'w' else (8, -8)
+            pawn = 'p' if turn == 'w' else 'P'
+            if (board[target] != '.' or board[target + behind] != '.' or
+                board[target + ahead] != pawn):
+                raise ValueError('FEN en passant square without a pushed pawn: {0!r}'.format(
+                    fen))
+
+        halfmoves, fullmoves = 0, 1
+        if len(fields) == 6:
+            try:
+                halfmoves, fullmoves = int(fields[4]), int(fields[5])
+            except ValueError:
+                raise ValueError('bad FEN move counters: {0!r}'.format(fen))
+
+        color = ChessGame.WHITE if turn == 'w' else ChessGame.BLACK
+        game  = ChessGame()
+        game._load_board(board, color)
+        if game.color_in_check(game.get_opponent_color(color)):
+            raise ValueError('FEN side not to move is in check: {0!r}'.format(fen))
+        game._set_castling(rights)
+        if target is not None:
+            pawns = game.__bitboards[color]['pawn']
+            if tables.PAWN_ATTACKS[game.get_opponent_color(color)][target] & pawns:
+                game._set_en_passant(target)
+        game.__halfmoves, game.__fullmoves = halfmoves, fullmoves
+
+        # only now that the FEN is known to be good is this game's position replaced
+        self.restore(game.snapshot())
+
+    def to_fen(self):
+        """
+        Describe the position as a FEN string
+        """
+
+        position = self.snapshot()
+        board    = position.board
+        rows = []
+        for x in reversed(range(8)):
+            row, empty = '', 0
+            for letter in board[8 * x: 8 * x + 8]:
+                if letter == '.':
+                    empty += 1
+                    continue
+                if empty:
+                    row, empty = row + str(empty), 0
+                row += letter
+            rows.append(row + (str(empty) if empty else ''))
+
+        rights = ''.join(letter for letter, castle in
+                         zip('KQkq', tables.CASTLES['white'] + tables.CASTLES['black'])
+                         if position.castling & castle[0])
+
+        target = '-'
+        if position.en_passant is not None:
+            x, y = bits.coords(position.en_passant)
+            target = 'abcdefgh'[y] + str(x + 1)
+
+        return ' '.join(['/'.join(rows), 'w' if position.turn == ChessGame.WHITE else 'b',
+                         rights or '-', target, str(position.halfmoves),
+                         str(position.fullmoves)])
+
+    def _set_castling(self, rights):
+        """
+        Replace the castling rights mask; for internal use only
+        """
+
+        self.__key ^= Zobrist.CASTLING[self.__castling] ^ Zobrist.CASTLING[rights]
+        self.__castling = rights
+
+    def _set_en_passant(self, sq):
+        """
+        Set the square a pawn just skipped over (None if there is none); for internal use only
+        """
+
+        if self.__en_passant is not None:
+            self.__key ^= Zobrist.EN_PASSANT[self.__en_passant & 7]
+        if sq is not None:
+            self.__key ^= Zobrist.EN_PASSANT[sq & 7]
+        self.__en_passant = sq
+
     def get_turn(self):
         """
         Get the current turn color
         """
         return self.__turn_info['turn']
 
+    def position_key(self):
+        """
+        Get the 64-bit Zobrist key of the current position (see Zobrist.py)
+            - kept up to date by every change to the board and turn, so reading it is O(1)
+        """
+        return self.__key
+
+    def evaluate(self):
+        """
+        Static evaluation in centipawns from the point of view of the side to move
+            - material and piece-square sums (see Evaluation.py) are kept up to date as
+              pieces are placed and removed, so this is O(1)
+        """
+
+        score = Evaluation.tapered(self.__mg, self.__eg, self.__phase)
+        if self.get_turn() == ChessGame.BLACK:
+            return -score
+        return score
+
     def get_player_piece_locs(self, mycolor):
         """
         Get piece locations for @mycolor
@@ -60,7 +365,8 @@ class ChessGame:
         if mycolor not in (ChessGame.BLACK, ChessGame.WHITE):
             return None
 
-        return self.__players[mycolor]
+        return { bits.coords(sq) for sq in
+                 bits.iter_squares(self.__occupied[mycolor]) }
 
     def get_opponent_color(self, mycolor):
         """
@@ -77,8 +383,8 @@ class ChessGame:
         """
         Get piece locations and pieces for @mycolor
         """
-        pieces = { (x, y) : self.get_piece(x, y) for (x, y) in
-                   self.__players[mycolor] }
+        pieces = { bits.coords(sq) : self.__squares[sq] for sq in
+                   bits.iter_squares(self.__occupied[mycolor]) }
         if None in pieces.values():
             raise ValueError()
         return pieces
@@ -93,18 +399,25 @@ class ChessGame:
         """
         Determine if x,y is a piece
         """
-        return ((x, y) in self.__board and
-                isinstance((self.__board[(x, y)]), self.Piece))
+        return (self.in_bounds(x, y) and
+                self.__squares[bits.square(x, y)] is not None)
 
     def get_piece(self, x, y):
         """
         Get piece at (x,y)
-            - Use this function rather than accessing self.__board directly
+            - Use this function rather than accessing self.__squares directly
         """
-        if self.in_bounds(x, y) and self.piece_at(x, y):
-            return self.__board[(x, y)]
+        if self.in_bounds(x, y):
+            return self.__squares[bits.square(x, y)]
         return None
 
+    def piece_on(self, sq):
+        """
+        Get piece on square index @sq (see Bitboards.py); None if the square is empty
+            - same as get_piece, for callers that already work with square indices
+        """
+        return self.__squares[sq]
+
     def is_enemy(self, x, y, mycolor):
         """
         Determine if piece at (x,y) is an enemy
@@ -114,88 +427,622 @@ class ChessGame:
             return piece.color != mycolor
         return False
 
+    def status(self):
+        """
+        Get the GameStatus (check, checkmate, stalemate, legal move count, draws by
+        repetition or the fifty-move rule) of the position
+            - the parts that depend only on the position are computed once and remembered
+              by position key for the last STATUS_CACHE_SIZE positions, so repeated calls
+              after a move cost a lookup plus the repetition scan
+            - the legal moves are counted by building legal_move_map, so a turn that asks
+              for both generates its moves once
+        """
+
+        key    = self.__key
+        status = self.__statuses.pop(key, None)
+        if status is None:
+            turn     = self.get_turn()
+            in_check = self.color_in_check(turn)
+            self.legal_move_map()
+            count    = self.__move_map[2]
+            status   = GameStatus(turn, in_check, in_check and not count,
+                                  not in_check and not count, count, False, False)
+            if len(self.__statuses) >= ChessGame.STATUS_CACHE_SIZE:
+                self.__statuses.popitem(last=False)
+        self.__statuses[key] = status
+
+        threefold   = self.repetitions() >= 2
+        fifty_moves = self.__halfmoves >= 100 and not status.checkmate
+        if threefold or fifty_moves:
+            status = status._replace(threefold=threefold, fifty_moves=fifty_moves)
+        return status
+
+    def halfmove_clock(self):
+        """
+        Get the number of moves (by either side) since the last capture or pawn move
+        """
+        return self.__halfmoves
+
+    def repetitions(self):
+        """
+        Count the earlier occurrences of the current position in the game
+            - only positions since the last capture or pawn move can repeat it, and only
+              every other one has the same side to move, so this is O(halfmove clock)
+        """
+
+        keys, key = self.__keys, self.__key
+        first = max(len(keys) - self.__halfmoves, 0)
+        return sum(1 for i in range(len(keys) - 2, first - 1, -2) if keys[i] == key)
+
+    def is_repetition(self):
+        """
+        Determine whether the current position has occurred before in the game; cheaper than
+        repetitions() as it stops at the first match
+        """
+
+        keys, key = self.__keys, self.__key
+        first = max(len(keys) - self.__halfmoves, 0)
+        for i in range(len(keys) - 2, first - 1, -2):
+            if keys[i] == key:
+                return True
+        return False
+
     def has_winner(self):
         """
         Determine if BLACK or WHITE has a win.
             - return None if no win
+            - only the side to move can be check-mated, so this reads status()
         """
-        if self.color_check_mate(ChessGame.BLACK):
-            return ChessGame.WHITE
-        elif self.color_check_mate(ChessGame.WHITE):
-            return ChessGame.BLACK
-        else:
-            return None
+        return self.status().winner
 
     def color_in_check(self, mycolor):
         """
         Determine whether mycolor is in check 
         """
 
-        opponent = self.__players[self.get_opponent_color(mycolor)]
+        king = self._king_square(mycolor)
+        opponent = self.get_opponent_color(mycolor)
+        return bool(self._attackers(king, opponent, self._occupancy()))
+
+    def color_check_mate(self, mycolor):
+        """
+        Determine whether mycolor is in check-mate 
+        """
+
+        if mycolor == self.get_turn():
+            return self.status().checkmate
+
+        if not self.color_in_check(mycolor):
+            return False
+
+        return not any(self._legal_targets(mycolor).values())
+
+    def generate_legal_moves(self):
+        """
+        Get every legal move for the side to move in one pass, as a list of move encodings
+            - see encode_move for the layout; decode_move turns one back into (at, to)
+            - the king, checkers and pins are found once for the whole position
+            - a pawn reaching the last row gives one move per promotion piece, queen first
+        """
+
+        pawns = self.__bitboards[self.get_turn()]['pawn']
+        moves = []
+        for sq, targets in self._legal_targets(self.get_turn()).items():
+            promoting = bits.EMPTY
+            if bits.bit(sq) & pawns:
+                promoting = targets & tables.LAST_ROWS
+                targets  ^= promoting
+
+            for to in bits.iter_squares(targets):
+                moves.append(sq | (to << 6))
+            for to in bits.iter_squares(promoting):
+                for flag in (4, 1, 3, 2):
+                    moves.append(sq | (to << 6) | (flag << 12))
+        return moves
+
+    def generate_captures(self):
+        """
+        Get the legal captures (en passant included) and queen promotions for the side to
+        move, as move encodings; the moves a quiescence search looks at
+        """
+
+        turn    = self.get_turn()
+        pawns   = self.__bitboards[turn]['pawn']
+        enemy   = self.__occupied[self.get_opponent_color(turn)]
+        passant = bits.bit(self.__en_passant) if self.__en_passant is not None else bits.EMPTY
+        moves   = []
+        for sq, targets in self._legal_targets(turn).items():
+            if bits.bit(sq) & pawns:
+                for to in bits.iter_squares(targets & tables.LAST_ROWS):
+                    moves.append(sq | (to << 6) | (4 << 12))
+                targets &= (enemy | passant) & ~tables.LAST_ROWS
+            else:
+                targets &= enemy
 
-        x, y = None, None
-        for (u, v) in self.__players[mycolor]:
-            piece = self.get_piece(u, v)
-            if not piece:
-                raise ValueError()
+            for to in bits.iter_squares(targets):
+                moves.append(sq | (to << 6))
+        return moves
 
-            if self.get_piece(u, v).name == 'king':
-                x, y = u, v
+    def see(self, move):
+        """
+        Static exchange evaluation of the encoded @move: the material it wins, in
+        centipawns (negative if it loses material), once both sides have made the best
+        series of recaptures on its destination square
+            - each side recaptures with its least valuable attacker and may stop at any
+              point; pieces lined up behind one another join in as the ones in front leave
+            - pins are ignored
+        """
+
+        values = Evaluation.SEE_VALUES
+        at, to = move & 0x3f, (move >> 6) & 0x3f
+        piece  = self.__squares[at]
+        victim = self.__squares[to]
+
+        occupied = self._occupancy() ^ bits.bit(at)
+        if victim:
+            gain = [values[victim.name]]
+        elif piece.name == 'pawn' and (at - to) & 7:
+            gain = [values['pawn']]
+            occupied ^= bits.bit((at & ~7) | (to & 7))
+        else:
+            gain = [0]
+
+        attacker = piece.name
+        if move >> 12:
+            attacker = ChessGame.PROMOTIONS[move >> 12]
+            gain[0] += values[attacker] - values['pawn']
+
+        # gain[d] is what the side making capture d wins if it stops after capture d + 1
+        side = self.get_opponent_color(piece.color)
+        while True:
+            attackers = self._attackers(to, side, occupied) & occupied
+            if not attackers:
                 break
+            for name in ChessGame.NAMES:
+                found = attackers & self.__bitboards[side][name]
+                if found:
+                    break
+            gain.append(values[attacker] - gain[-1])
+            attacker  = name
+            occupied ^= found & -found
+            side      = self.get_opponent_color(side)
+
+        for d in range(len(gain) - 1, 0, -1):
+            gain[d - 1] = -max(-gain[d - 1], gain[d])
+        return gain[0]
+
+    @staticmethod
+    def encode_move(at, to, promotion=None):
+        """
+        Pack a move from board location @at to @to into a 16 bit int
+            - bits 0-5 hold the origin square, bits 6-11 the destination square
+            - bits 12-15 hold the index of @promotion in PROMOTIONS (0 for no promotion)
+            - castling is encoded as the king's two square move; castling, en passant and
+              double pawn pushes are recognised from the position when the move is made
+        """
+        flag = ChessGame.PROMOTIONS.index(promotion)
+        return bits.square(*at) | (bits.square(*to) << 6) | (flag << 12)
 
-        for (u, v) in opponent:
-            if (x, y) in self._get_piece_moves(u, v):
-                return True
+    @staticmethod
+    def decode_move(move):
+        """
+        Unpack a move encoding into board locations (at, to); see get_promotion
+        """
+        return bits.coords(move & 0x3f), bits.coords((move >> 6) & 0x3f)
 
-        return False
+    @staticmethod
+    def get_promotion(move):
+        """
+        Name of the piece a move encoding promotes to, or None
+        """
+        return ChessGame.PROMOTIONS[move >> 12]
 
-    def color_check_mate(self, mycolor):
+    @staticmethod
+    def move_name(move):
         """
-        Determine whether mycolor is in check-mate 
+        Coordinate notation for a move encoding, e.g. e2e4 or e7e8q (columns are files a-h,
+        rows are ranks 1-8 from white's side)
         """
 
-        if not self.color_in_check(mycolor):
-            return False
+        name = ''
+        for sq in (move & 0x3f, (move >> 6) & 0x3f):
+            x, y = bits.coords(sq)
+            name += 'abcdefgh'[y] + str(x + 1)
+        if move >> 12:
+            name += ChessGame.LETTERS[ChessGame.PROMOTIONS[move >> 12]]
+        return name
+
+    def _occupancy(self):
+        """
+        Bitboard of every occupied square
+        """
+        return self.__occupied[ChessGame.WHITE] | self.__occupied[ChessGame.BLACK]
+
+    def _king_square(self, mycolor):
+        """
+        Square index of @mycolor's king
+        """
+
+        king = self.__bitboards[mycolor]['king']
+        if not king:
+            raise ValueError()
+        return bits.lsb(king)
+
+    def _attackers(self, sq, color, occupied):
+        """
+        Bitboard of @color pieces attacking square @sq when the board holds @occupied
+            - a pawn of @color attacks @sq exactly when an opponent pawn on @sq would
+              attack the pawn's square
+        """
+
+        pieces = self.__bitboards[color]
+        diagonal   = pieces['bishop'] | pieces['queen']
+        orthogonal = pieces['rook'] | pieces['queen']
+        opponent   = self.get_opponent_color(color)
+
+        return ((tables.KNIGHT_ATTACKS[sq] & pieces['knight']) |
+                (tables.KING_ATTACKS[sq] & pieces['king']) |
+                (tables.PAWN_ATTACKS[opponent][sq] & pieces['pawn']) |
+                (diagonal and tables.bishop_attacks(sq, occupied) & diagonal) |
+                (orthogonal and tables.rook_attacks(sq, occupied) & orthogonal))
+
+    def _pins(self, mycolor, king):
+        """
+        Map each of @mycolor's pinned pieces to the squares it may still move to: the ray
+        from the king up to and including the pinning piece
+        """
+
+        opponent = self.get_opponent_color(mycolor)
+        own      = self.__occupied[mycolor]
+        occupied = own | self.__occupied[opponent]
+        enemy    = self.__bitboards[opponent]
+        sliders  = {
+            tables.ROOK_DIRECTIONS: enemy['rook'] | enemy['queen'],
+            tables.BISHOP_DIRECTIONS: enemy['bishop'] | enemy['queen']
+        }
+
+        pins = dict()
+        for direcs, pinners in sliders.items():
+            if not pinners:
+                continue
+            for direc in direcs:
+                ray      = tables.RAY_MASKS[direc][king]
+                blockers = ray & occupied
+                if not ray & pinners or not blockers:
+                    continue
+
+                first = tables.nearest(direc, blockers)
+                if not bits.bit(first) & own:
+                    continue
+
+                behind = blockers ^ bits.bit(first)
+                if not behind:
+                    continue
+
+                second = tables.nearest(direc, behind)
+                if bits.bit(second) & pinners:
+                    pins[first] = ray ^ tables.RAY_MASKS[direc][second]
+
+        return pins
+
+    def _legal_targets(self, mycolor):
+        """
+        Map the square of each @mycolor piece to a bitboard of its legal destinations
+            - checkers, pinned pieces and the check evasion mask are computed once for
+              the position, so no move is ever made and unmade to test it
+            - in double check only the king may move
+        """
+
+        opponent = self.get_opponent_color(mycolor)
+        own      = self.__occupied[mycolor]
+        enemy    = self.__occupied[opponent]
+        occupied = own | enemy
+        king     = self._king_square(mycolor)
+        checkers = self._attackers(king, opponent, occupied)
+
+        # the king may not step along a checking ray, so look through it
+        without_king = occupied ^ bits.bit(king)
+        king_targets = bits.EMPTY
+        for to in bits.iter_squares(tables.KING_ATTACKS[king] & ~own):
+            if not self._attackers(to, opponent, without_king):
+                king_targets |= bits.bit(to)
+
+        if not checkers:
+            king_targets |= self._castling_targets(mycolor, occupied)
+
+        legal = { king: king_targets }
+        if checkers and checkers & (checkers - 1):
+            return legal
+
+        evasions = bits.FULL
+        if checkers:
+            evasions = checkers | tables.BETWEEN[king][bits.lsb(checkers)]
+
+        pins = self._pins(mycolor, king)
+        for sq in bits.iter_squares(own ^ bits.bit(king)):
+            name = self.__squares[sq].name
+            if name == 'pawn':
+                targets = self._pawn_targets(sq, mycolor, enemy, occupied)
+            else:
+                targets = tables.piece_attacks(name, sq, occupied) & ~own
+
+            targets &= evasions
+            if sq in pins:
+                targets &= pins[sq]
+            legal[sq] = targets
+
+        for sq in self._en_passant_captures(mycolor, king, occupied):
+            legal[sq] |= bits.bit(self.__en_passant)
 
-        incheck = True
-        for (x, y) in self.__players[mycolor]:
-            moves = self._get_piece_moves(x, y)
-            for to in moves:
-                res, captured = self._make_move((x, y), to)
-                if not self.color_in_check(mycolor):
-                    incheck = False
+        return legal
 
-                self._unmake_move(to, (x, y), captured)
-                if not incheck:
-                    return False
+    def _pawn_targets(self, sq, mycolor, enemy, occupied):
+        """
+        Captures and pushes (including the first two square push) of a pawn on @sq,
+        not counting en passant
+        """
 
-        return incheck
+        targets = tables.PAWN_ATTACKS[mycolor][sq] & enemy
+        push    = tables.PAWN_PUSHES[mycolor][sq] & ~occupied
+        if push:
+            targets |= push | (tables.PAWN_DOUBLE_PUSHES[mycolor][sq] & ~occupied)
+        return targets
 
-    def make_move(self, at, to):
+    def _castling_targets(self, mycolor, occupied):
+        """
+        Destinations of @mycolor's king for each castle that is legal right now
+            - the caller must already know that @mycolor is not in check
+        """
+
+        opponent = self.get_opponent_color(mycolor)
+        targets  = bits.EMPTY
+        for right, king_from, king_to, rook_from, rook_to, empty, safe in \
+            tables.CASTLES[mycolor]:
+            if not self.__castling & right or occupied & empty:
+                continue
+            if not any(self._attackers(sq, opponent, occupied) for sq in safe[1:]):
+                targets |= bits.bit(king_to)
+        return targets
+
+    def _en_passant_captures(self, mycolor, king, occupied):
+        """
+        Squares of @mycolor's pawns that may legally capture en passant
+            - the en passant square belongs to the side to move, so the other side has none
+            - the capture removes two pieces from one row, which can expose the king in
+              ways the pin masks do not cover, so each candidate is checked directly
+        """
+
+        target = self.__en_passant
+        if target is None or mycolor != self.get_turn():
+            return []
+
+        opponent = self.get_opponent_color(mycolor)
+        captured = target - 8 if mycolor == ChessGame.WHITE else target + 8
+        pawns    = tables.PAWN_ATTACKS[opponent][target] & self.__bitboards[mycolor]['pawn']
+
+        legal = []
+        for sq in bits.iter_squares(pawns):
+            after = occupied ^ bits.bit(sq) ^ bits.bit(captured) | bits.bit(target)
+            if not self._attackers(king, opponent, after) & ~bits.bit(captured):
+                legal.append(sq)
+        return legal
+
+    def make_move(self, at, to, promotion='queen'):
         """
         Wrapper for internal _make_move that advances turn for ChessGame instances
         """
 
-        made, captured = self._make_move(at, to)
+        made, captured = self._make_move(at, to, promotion)
         if made:
             self._advance_turn()
+            self.__undone = []
         return made, captured
 
+    def push_move(self, move):
+        """
+        Make the encoded @move and advance the turn, skipping all validation
+            - @move must come from generate_legal_moves for the current position
+            - meant for search code that makes and unmakes many moves; undo with pop_move
+        """
+
+        self._do_move(move)
+        self._advance_turn()
+
+    def pop_move(self):
+        """
+        Undo the most recent push_move
+        """
+
+        self._advance_turn()
+        self._undo_move()
+
+    def push_null(self):
+        """
+        Pass the turn without moving, for null-move pruning in search code; undo with
+        pop_null before any other move is taken back
+            - the en passant square is cleared, and the null move counts as irreversible so
+              that no repetition is found across it
+        """
+
+        self.__nulls.append((self.__en_passant, self.__halfmoves))
+        self.__keys.append(self.__key)
+        self._set_en_passant(None)
+        self.__halfmoves = 0
+        self._advance_turn()
+
+    def pop_null(self):
+        """
+        Undo the most recent push_null
+        """
+
+        self._advance_turn()
+        en_passant, self.__halfmoves = self.__nulls.pop()
+        self.__keys.pop()
+        self._set_en_passant(en_passant)
+
+    def has_non_pawn_material(self, mycolor):
+        """
+        Determine whether @mycolor has a piece other than its king and pawns
+        """
+
+        pieces = self.__bitboards[mycolor]
+        return bool(pieces['knight'] | pieces['bishop'] | pieces['rook'] | pieces['queen'])
+
+    def undo(self):
+        """
+        Take back the most recent move, whoever made it, and hand the turn back to its mover
+            - the move can be made again with redo until a new move is made with make_move
+            - return the move encoding taken back, or None if there is no move to undo
+        """
+
+        if not self.__pushed:
+            return None
+
+        move = self.__pushed[-1][0]
+        self._undo_move()
+        if self.__squares[move & 0x3f].color != self.get_turn():
+            self._advance_turn()
+        self.__undone.append(move)
+        return move
+
+    def redo(self):
+        """
+        Make again the most recently undone move
+            - return its move encoding, or None if there is no move to redo
+        """
+
+        if not self.__undone:
+            return None
+
+        move = self.__undone.pop()
+        self.push_move(move)
+        return move
+
+    def last_move(self):
+        """
+        Get the encoding of the most recent move (see encode_move), or None
+        """
+
+        if not self.__pushed:
+            return None
+        return self.__pushed[-1][0]
+
+    def last_move_squares(self):
+        """
+        Get the board locations changed by the most recent move, including the rook's
+        squares when castling and the captured pawn's square for en passant
+        """
+
+        if not self.__pushed:
+            return set()
+
+        move, captured, castling, en_passant, halfmoves = self.__pushed[-1]
+        at, to  = move & 0x3f, (move >> 6) & 0x3f
+        squares = { at, to }
+        name    = self.__squares[to].name
+        if name == 'king' and abs(to - at) == 2:
+            squares.update(tables.CASTLE_ROOKS[to])
+        elif name == 'pawn' and to == en_passant:
+            squares.add((at & ~7) | (to & 7))
+        return { bits.coords(sq) for sq in squares }
+
     def _advance_turn(self):
         """
         Update move color; for internal use only
         """
 
-        self.__turn_info['turn'] = ChessGame.BLACK if
-            self.__turn_info['turn'] == ChessGame.WHITE else ChessGame.WHITE
+        self.__turn_info['turn'] = (ChessGame.BLACK if
+            self.__turn_info['turn'] == ChessGame.WHITE else ChessGame.WHITE)
+        self.__key ^= Zobrist.SIDE
+
+    def _do_move(self, move):
+        """
+        Apply the encoded @move to the board without changing the turn; for internal use only
+            - handles captures, en passant, castling, promotion and the castling rights,
+              en passant square and move counters that follow from the move
+            - return the captured piece, or None
+        """
+
+        at, to   = move & 0x3f, (move >> 6) & 0x3f
+        piece    = self.__squares[at]
+        captured = self.__squares[to]
+        if captured:
+            self._remove_piece(to)
+        elif piece.name == 'pawn' and to == self.__en_passant:
+            captured = self._remove_piece((at & ~7) | (to & 7))
+        self.__pushed.append((move, captured, self.__castling, self.__en_passant,
+                              self.__halfmoves))
+        self.__keys.append(self.__key)
+
+        self.__halfmoves += 1
+        if captured or piece.name == 'pawn':
+            self.__halfmoves = 0
+        if piece.color == ChessGame.BLACK:
+            self.__fullmoves += 1
+
+        self._remove_piece(at)
+        if move >> 12:
+            piece = ChessGame.Piece(ChessGame.PROMOTIONS[move >> 12], piece.color)
+        self._put_piece(to, piece)
+
+        en_passant = None
+        if piece.name == 'king' and abs(to - at) == 2:
+            rook_from, rook_to = tables.CASTLE_ROOKS[to]
+            self._put_piece(rook_to, self._remove_piece(rook_from))
+        elif piece.name == 'pawn' and abs(to - at) == 16:
+            skipped  = (at + to) >> 1
+            opponent = self.get_opponent_color(piece.color)
+            if (tables.PAWN_ATTACKS[piece.color][skipped] &
+                self.__bitboards[opponent]['pawn']):
+                en_passant = skipped
+
+        self._set_en_passant(en_passant)
+        self._set_castling(self.__castling & tables.CASTLING_KEPT[at] &
+                           tables.CASTLING_KEPT[to])
+        if self.__check_every:
+            self._sample_integrity()
+        return captured
+
+    def _undo_move(self):
+        """
+        Take back the most recent _do_move; for internal use only
+        """
+
+        move, captured, castling, en_passant, halfmoves = self.__pushed.pop()
+        self.__keys.pop()
+        at, to = move & 0x3f, (move >> 6) & 0x3f
+
+        piece = self._remove_piece(to)
+        if move >> 12:
+            piece = ChessGame.Piece('pawn', piece.color)
+        self._put_piece(at, piece)
 
-    def _make_move(self, at, to):
+        if piece.name == 'king' and abs(to - at) == 2:
+            rook_from, rook_to = tables.CASTLE_ROOKS[to]
+            self._put_piece(rook_from, self._remove_piece(rook_to))
+
+        if captured:
+            if piece.name == 'pawn' and to == en_passant:
+                self._put_piece((at & ~7) | (to & 7), captured)
+            else:
+                self._put_piece(to, captured)
+
+        self._set_en_passant(en_passant)
+        self._set_castling(castling)
+        self.__halfmoves = halfmoves
+        if piece.color == ChessGame.BLACK:
+            self.__fullmoves -= 1
+        if self.__check_every:
+            self._sample_integrity()
+
+    def _make_move(self, at, to, promotion='queen'):
         """
         Make a move for a piece at @at to @to
             - first verify that the move is valid
             - an invalid move is one that isn't on the board or one where there's no piece to move
-            - next, see if we need to capture (remove from opponents pieces)
-            - finally, replace whatever was at u,v with what as at board; report success
+            - a move that would leave the mover in check is refused without touching the board
+            - a pawn reaching the last row becomes @promotion
+            - legal moves are found in legal_move_map; only a refused move is looked at further
 
         return NONE (no move to be made), TRUE (move succeeded), FALSE (move puts opponent in check)
                along with CAPTURED to simplify code used by AI/GUI
@@ -211,37 +1058,24 @@ class ChessGame:
         if piece.color != self.get_turn():
             return None, None
 
-        if at == to or to not in self._get_piece_moves(x, y):
-            return None, None
-
-        color    = piece.color
-        captured = None
-        if self.is_enemy(u, v, color):
-            captured = self.get_piece(u, v)
-
-            del self.__board[(u, v)]
-            self.__players[self.get_opponent_color(color)].remove((u, v))
-
-        self.__board[(u, v)] = piece
-        del self.__board[(x, y)]
-
-        self.__players[piece.color].remove((x, y))
-        self.__players[piece.color].add((u, v))
+        if (u, v) not in self.legal_move_map().get((x, y), ()):
+            if at == to or (u, v) not in self._get_piece_moves(x, y):
+                return None, None
+            return False, None
 
-        ret = True
-        if self.color_in_check(color):
-            self._unmake_move(to, at, captured)
-            ret = False
+        target = bits.square(u, v)
+        move   = bits.square(x, y) | (target << 6)
+        if piece.name == 'pawn' and bits.bit(target) & tables.LAST_ROWS:
+            move |= ChessGame.PROMOTIONS.index(promotion) << 12
 
-        self._check_integrity()
-        return ret, captured
+        return True, self._do_move(move)
 
     def _unmake_move(self, at, to, captured=None):
         """
         Unmake a move for a piece moved to @at back to @to
             - if we're out of bounds, or there's no piece at u,v then we can't do anything 
-            - captured is the result of a capture, or None if nothing was captured 
-            - exchange whatever is at u,v with whatever is at x,y
+            - only the most recent move can be unmade; what it captured (@captured), castling
+              rights and the en passant square are restored from the move stack
         """
 
         u, v = at
@@ -251,42 +1085,104 @@ class ChessGame:
             return False
 
         piece = self.get_piece(u, v)
-        if not piece:
+        if not piece or not self.__pushed:
             raise ValueError()
 
-        if isinstance(captured, ChessGame.Piece):
-            opponent = self.get_opponent_color(piece.color)
-            self.__board[(u, v)] = captured
-            self.__players[opponent].add((u, v))
-        else:
-            del self.__board[(u, v)]
+        move = self.__pushed[-1][0]
+        if (move & 0x3f, (move >> 6) & 0x3f) != (bits.square(x, y), bits.square(u, v)):
+            raise ValueError()
 
-        self.__board[(x, y)] = piece
-        self.__players[piece.color].add((x, y))
-        self.__players[piece.color].remove((u, v))
-        self._check_integrity()
+        self._undo_move()
         return True
 
+    def set_integrity_checks(self, every=1):
+        """
+        Debug mode: run _check_integrity after every @every-th make or unmake of a move
+            - @every=0 (the default for a new game) turns the checks off, leaving make and
+              unmake O(1)
+        """
+
+        self.__check_every = max(0, every)
+        self.__checks      = 0
+
+    def _sample_integrity(self):
+        """
+        Count one make or unmake and check the board if it is a sampled one; for internal
+        use only
+        """
+
+        self.__checks += 1
+        if self.__checks % self.__check_every == 0:
+            self._check_integrity()
+
     def _check_integrity(self):
         """
         Check the integrity of the board
-            - make sure that each piece in a players piece set is in the board
-            - the union of the piece sets must cover the board exactly 
+            - each color's occupancy must be the union of its piece bitboards
+            - the piece bitboards must not overlap
+            - the square list must agree with the bitboards on every square
+            - the incrementally updated key and evaluation sums must match ones computed
+              from scratch
         """
 
-        count = 0
-        for (x, y) in self.__players[ChessGame.BLACK].union(
-            self.__players[ChessGame.WHITE]):
-            assert (x, y) in self.__board
-            count += 1
-
-        assert count == len(self.__board)
+        everything = bits.EMPTY
+        for color in ChessGame.COLORS:
+            union = bits.EMPTY
+            for name, bb in self.__bitboards[color].items():
+                assert not bb & everything
+                everything |= bb
+                union |= bb
+                for sq in bits.iter_squares(bb):
+                    assert self.__squares[sq] == (name, color)
+            assert union == self.__occupied[color]
+
+        assert bits.popcount(everything) == 64 - self.__squares.count(None)
+
+        key = Zobrist.SIDE if self.get_turn() == ChessGame.BLACK else 0
+        key ^= Zobrist.CASTLING[self.__castling]
+        if self.__en_passant is not None:
+            key ^= Zobrist.EN_PASSANT[self.__en_passant & 7]
+        mg, eg, phase = 0, 0, 0
+        for sq, piece in enumerate(self.__squares):
+            if piece:
+                key ^= Zobrist.PIECES[piece.color][piece.name][sq]
+                mg  += Evaluation.MG[piece.color][piece.name][sq]
+                eg  += Evaluation.EG[piece.color][piece.name][sq]
+                phase += Evaluation.PHASE[piece.name]
+        assert key == self.__key
+        assert (mg, eg, phase) == (self.__mg, self.__eg, self.__phase)
+
+
+    def legal_move_map(self):
+        """
+        Get the legal moves of the side to move as { (x, y): frozenset of (u, v) targets }
+            - built once per position and kept until the position key changes, so clicks and
+              move validation during a turn are dictionary lookups
+            - the legal move count status() reports is taken in the same pass
+        """
 
+        key, moves, count = self.__move_map
+        if key != self.__key:
+            turn  = self.get_turn()
+            pawns = self.__bitboards[turn]['pawn']
+            moves, count = { }, 0
+            for sq, targets in self._legal_targets(turn).items():
+                if not targets:
+                    continue
+                moves[bits.coords(sq)] = frozenset(bits.coords(to)
+                                                   for to in bits.iter_squares(targets))
+                count += bits.popcount(targets)
+                if bits.bit(sq) & pawns:
+                    # one move per promotion piece, as in generate_legal_moves
+                    count += 3 * bits.popcount(targets & tables.LAST_ROWS)
+            self.__move_map = self.__key, moves, count
+        return moves
 
     def get_moves(self, x, y):
         """
         Top-level function that should be used ONLY by GUI/AI (do not use with ChessGame.py)
-            - gets moves that won't the moving player in check
+            - gets moves that won't the moving player in check, using _legal_targets rather
+              than trying each move on the board
             - should not be used in ChessGame.py..._make_move makes calls to _get_piece_moves
               and we could induce infinite recursion by replacing that call with a call to
               get_moves
@@ -294,104 +1190,44 @@ class ChessGame:
         TODO: think about making this a static function, accessible with ChessGame.get_piece_moves(boards, x, y)
         """
 
-        if not self.piece_at(x, y):
+        piece = self.get_piece(x, y)
+        if not piece:
             return set()
 
-        moves = self._get_piece_moves(x, y)
-        legal = set(moves)
-        at = x, y
-        for to in moves:
-            res, captured = self._make_move(at, to)
-            if not res:
-                legal.remove(to)
-            else:
-                self._unmake_move(to, at, captured)
-
-        self._check_integrity()
-        return legal
-
-    def _get_moves_indirection(self, x, y, direc, moves=[]):
-        """
-        Get sequential moves in a given direction recursively
-            - handle attack moves with the move function 
-        """
-
-        compass = {
-            'up'    : (x-1, y),
-            'down'  : (x+1, y),
-            'left'  : (x, y-1),
-            'right' : (x, y+1),
-            'd1'    : (x-1, y+1),
-            'd2'    : (x+1, y-1),
-            'd3'    : (x+1, y+1),
-            'd4'    : (x-1, y-1)
-        }
-
-        u, v = compass[direc]
-        if not self.in_bounds(u, v):
-            return moves
-
-        if self.piece_at(u, v):
-            return [(u, v)] + moves
-        return [(u, v)] + self._get_moves_indirection(u, v, direc, moves)
+        if piece.color == self.get_turn():
+            return self.legal_move_map().get((x, y), frozenset())
 
+        targets = self._legal_targets(piece.color).get(bits.square(x, y), bits.EMPTY)
+        return { bits.coords(to) for to in bits.iter_squares(targets) }
 
     def _get_piece_moves(self, x, y):
         """
         Get moves for a piece at location @x, @y. Should NOT be called by GUI/AI
             - @x denotes the row on the board. Increases in x imply downward movement
             - @y denotes the column on the board
+            - targets come from the precomputed tables in AttackTables.py
         """
 
         piece = self.get_piece(x, y)
-        moves = []
-
         if not piece:
-            return moves
-
-        if piece.name == 'rook' or piece.name == 'queen':
-            direcs = ['up', 'down', 'left', 'right']
-            moves = [self._get_moves_indirection(x, y, direc) for direc in
-                     direcs]
-
-        elif piece.name == 'bishop' or piece.name == 'queen':
-            direcs = ['d1', 'd2', 'd3', 'd4']
-            for direc in direcs:
-                moves +=  self._get_moves_indirection(x, y, direc)
-
-        elif piece.name == 'king':
-            moves = [(x-1, y-1), (x-1, y), (x-1, y+1), (x, y-1),
-                     (x, y+1), (x+1, y-1), (x+1, y), (x+1, y+1)]
-
-        elif piece.name == 'knight':
-            moves = [(x-1, y-2), (x-2, y-1), (x-2, y+1), (x-1, y+2),
-                     (x+1, y+2), (x+2, y+1), (x+1, y-2), (x+2, y-1)]
-
-        elif piece.name == 'pawn':
-            if piece.color == ChessGame.BLACK:
-                moves = [(x-1, y), (x-1, y-1), (x-1, y+1)]
-            else:
-                moves = [(x+1, y), (x+1, y-1), (x+1, y+1)]
-
-            tmp = list(moves)
-            for u, v in tmp:
-                if v != y and not self.is_enemy(u, v, piece.color):
-                    moves.remove((u, v))
-
-                if v == y and self.is_enemy(u, v, piece.color):
-                    moves.remove((u, v))
-
-        mycolor = piece.color
-        valid   = set()
-        for (u, v) in moves:
-            if not self.in_bounds(u, v):
-                continue
+            return set()
 
-            if not self.get_piece(u, v):  # board is blank
-                valid.add((u, v))
+        sq       = bits.square(x, y)
+        own      = self.__occupied[piece.color]
+        enemy    = self.__occupied[self.get_opponent_color(piece.color)]
+        occupied = own | enemy
 
-            if self.is_enemy(u, v, mycolor):
-                valid.add((u, v))
+        if piece.name == 'pawn':
+            targets = self._pawn_targets(sq, piece.color, enemy, occupied)
+            if self.__en_passant is not None:
+                targets |= tables.PAWN_ATTACKS[piece.color][sq] & bits.bit(self.__en_passant)
+        else:
+            targets = tables.piece_attacks(piece.name, sq, occupied) & ~own
 
-        return valid
+        if piece.name == 'king':
+            for right, king_from, king_to, rook_from, rook_to, empty, safe in \
+                tables.CASTLES[piece.color]:
+                if self.__castling & right and not occupied & empty:
+                    targets |= bits.bit(king_to)
 
+        return { bits.coords(to) for to in bits.iter_squares(targets) }
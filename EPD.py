@@ -0,0 +1,82 @@
+"""
+Streaming reader for EPD (Extended Position Description) files
+    - each line holds the first four FEN fields followed by operations such as
+      bm Nf3; id "WAC.001"; or the perft suite style ;D1 20 ;D2 400
+    - files are read one line at a time, so arbitrarily large files use constant memory
+"""
+
+import shlex
+
+from ChessGame import ChessGame
+
+def parse_epd(line):
+    """
+    Split one EPD line into (fen, opcodes)
+        - @fen is a full six field FEN; the move counters come from the hmvc and fmvn
+          operations, or from two bare numbers after the fourth field, defaulting to 0 1
+        - @opcodes maps each opcode to its operand string, with quotes removed
+    """
+
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError('EPD needs at least 4 fields: {0!r}'.format(line))
+
+    position, rest = fields[:4], fields[4] if len(fields) == 5 else ''
+    counters = ['0', '1']
+
+    # some files (perft suites among them) write a full FEN before the operations
+    head = rest.split(';', 1)[0].split()
+    if len(head) == 2 and all(field.isdigit() for field in head):
+        counters = head
+        rest = rest.split(';', 1)[1] if ';' in rest else ''
+
+    opcodes = dict()
+    for operation in _split_operations(rest):
+        words = shlex.split(operation)
+        if words:
+            opcodes[words[0]] = ' '.join(words[1:])
+
+    counters[0] = opcodes.get('hmvc', counters[0])
+    counters[1] = opcodes.get('fmvn', counters[1])
+    return ' '.join(position + counters), opcodes
+
+def _split_operations(text):
+    """
+    Split @text at semicolons that are not inside a quoted operand
+    """
+
+    operations, current, quoted = [], [], False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        if char == ';' and not quoted:
+            operations.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    operations.append(''.join(current).strip())
+    return [operation for operation in operations if operation]
+
+def read_epd(source):
+    """
+    Yield (ChessGame, opcodes) for each position in @source, a path or an open file
+        - blank lines and lines starting with # are skipped
+        - a malformed line raises ValueError naming its line number
+    """
+
+    if isinstance(source, str):
+        with open(source) as lines:
+            for item in read_epd(lines):
+                yield item
+        return
+
+    for number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            fen, opcodes = parse_epd(line)
+            game = ChessGame.from_fen(fen)
+        except ValueError as error:
+            raise ValueError('line {0}: {1}'.format(number, error))
+        yield game, opcodes
@@ -0,0 +1,149 @@
+"""
+Evaluation tables for ChessGame.evaluate
+    - every piece contributes its material value plus a piece-square bonus, once for the
+      middlegame (MG) and once for the endgame (EG)
+    - PHASE weights the non-pawn material left on the board; the final score blends the
+      MG and EG sums by phase (a tapered evaluation)
+    - MG[color][name][sq] and EG[color][name][sq] are signed: positive for white, negative
+      for black, so ChessGame only has to add or subtract one entry per piece moved
+"""
+
+VALUES = { 'pawn': 100, 'knight': 320, 'bishop': 330, 'rook': 500, 'queen': 900,
+           'king': 0 }
+
+# piece values for static exchange evaluation, where losing the king must outweigh anything
+SEE_VALUES = dict(VALUES, king=20000)
+
+MG_MATERIAL = VALUES
+EG_MATERIAL = { 'pawn': 120, 'knight': 300, 'bishop': 320, 'rook': 520, 'queen': 940,
+                'king': 0 }
+
+PHASE = { 'pawn': 0, 'knight': 1, 'bishop': 1, 'rook': 2, 'queen': 4, 'king': 0 }
+MAX_PHASE = 24
+
+# piece-square bonuses from white's side, drawn as a diagram: the first row is the far
+# rank (x = 7) and the last row is white's back rank (x = 0)
+_PAWN = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+
+_PAWN_ENDGAME = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     80,  80,  80,  80,  80,  80,  80,  80,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     15,  15,  15,  15,  15,  15,  15,  15,
+      5,   5,   5,   5,   5,   5,   5,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+
+_KNIGHT = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+
+_BISHOP = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+
+_ROOK = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+]
+
+_QUEEN = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+
+_KING = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+]
+
+_KING_ENDGAME = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+_MG_SQUARES = { 'pawn': _PAWN, 'knight': _KNIGHT, 'bishop': _BISHOP, 'rook': _ROOK,
+                'queen': _QUEEN, 'king': _KING }
+_EG_SQUARES = dict(_MG_SQUARES, pawn=_PAWN_ENDGAME, king=_KING_ENDGAME)
+
+def _by_square(diagram, color):
+    """
+    Reindex a diagram by square index for @color; black's squares mirror white's
+    """
+
+    table = [0] * 64
+    for row in range(8):
+        for y in range(8):
+            x = 7 - row
+            if color == 'black':
+                x = row
+            table[8 * x + y] = diagram[8 * row + y]
+    return table
+
+def _signed(material, squares):
+    tables = dict()
+    for color, sign in (('white', 1), ('black', -1)):
+        tables[color] = { name: [sign * (material[name] + bonus) for bonus in
+                                 _by_square(squares[name], color)]
+                          for name in squares }
+    return tables
+
+MG = _signed(MG_MATERIAL, _MG_SQUARES)
+EG = _signed(EG_MATERIAL, _EG_SQUARES)
+
+def tapered(mg, eg, phase):
+    """
+    Blend the middlegame and endgame sums by @phase (MAX_PHASE is a full middlegame)
+    """
+
+    phase = min(phase, MAX_PHASE)
+    return (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
@@ -1,7 +1,8 @@
 from ChessGUI  import *
 from socket    import *
 from threading import *
-from ast       import literal_eval
+
+from WireProtocol import WireProtocol, ProtocolError
 
 class GameClient:
     """
@@ -31,6 +32,7 @@ class GameClient:
         self.game   = ChessGui(None, HumanPlayer('joe'), self.root, self,
                                self.queue)
         self.client = socket(AF_INET, SOCK_STREAM)
+        self.sent, self.received = 0, 0
         host, port  = self.host.get(), int(self.port.get())
         self.client.connect((host, port)) # temp for testing
 
@@ -79,26 +81,27 @@ class GameClient:
     def _recv_thread(self):
         """
         Listen to incoming instructions from second player. Put on second thread to allow concurrent execution
-            - incoming message must be in the form ((x,y), (u,v))
+            - incoming messages are WireProtocol frames; moves are put on the queue as
+              (move, key) for ChessGUI to make and check
+            - a move whose sequence number was already received is a duplicate and dropped
         """
-        while True:
-            try:
-                reply  = self.client.recv(1024)
-                if reply:
-                    print 'received something on client'
-                    at, to = literal_eval(reply)
-                    self.queue.put((at, to))
-
-            except:
-                self.client.close()
-
-    def send_move(self, at, to):
+        try:
+            for sequence, move, key in WireProtocol().read_moves(self.client):
+                if sequence >= self.received:
+                    self.received = sequence + 1
+                    self.queue.put((move, key))
+        except (error, ProtocolError):
+            pass
+        self.client.close()
+
+    def send_move(self, move, key):
         """
-        Will be executed by ChessGUI. Note that ChessGUI verifies that we have a move from @at to @to
-            - outgoing message must be in the form ((x,y), (u,v))
+        Will be executed by ChessGUI. Note that ChessGUI verifies that @move is legal
+            - @move is the move encoding and @key the position key reached with it; both go
+              out in one WireProtocol MOVE frame numbered by the moves sent so far
         """
-        message = '({at},{to})'.format(at=at, to=to)
-        self.client.send(message)
+        self.client.sendall(WireProtocol.pack_move(self.sent, move, key))
+        self.sent += 1
 
     def close(self):
         self.client.close()
@@ -1,7 +1,8 @@
 from ChessGUI  import *
 from socket    import *
 from threading import *
-from ast       import literal_eval
+
+from WireProtocol import WireProtocol, ProtocolError
 
 class GameServer:
     """
@@ -26,6 +27,8 @@ class GameServer:
 
         self.server.listen(2)
         self.conn      = None
+        self.sent      = 0
+        self.received  = 0
         self.listener  = Thread(target=self._recv_thread)
         self.listener.start()
         self._update_game()
@@ -41,29 +44,37 @@ class GameServer:
     def _recv_thread(self):
         """
         Listen to incoming instructions from second player. Put on second thread to allow concurrent execution
-            - incoming message must be in the form ((x,y), (u,v))
+            - incoming messages are WireProtocol frames; moves are put on the queue as
+              (move, key) for ChessGUI to make and check
+            - a move whose sequence number was already received is a duplicate and dropped
         """
 
         while True:
             if not self.conn: 
                 self.conn, address = self.server.accept()
+                self.sent, self.received = 0, 0
 
-            data  = self.conn.recv(1024)
-            if data:
-                at, to = literal_eval(data)
-                self.queue.put((at, to))
+            try:
+                for sequence, move, key in WireProtocol().read_moves(self.conn):
+                    if sequence >= self.received:
+                        self.received = sequence + 1
+                        self.queue.put((move, key))
+            except (error, ProtocolError):
+                pass
 
-        return
+            # the other player disconnected; wait for them to connect again
+            self.conn.close()
+            self.conn = None
 
-    def send_move(self, at, to):
+    def send_move(self, move, key):
         """
-        Will be executed by ChessGUI. Note that ChessGUI verifies that we have a move from @at to @to
-            - outgoing message must be in the form ((x,y), (u,v))
+        Will be executed by ChessGUI. Note that ChessGUI verifies that @move is legal
+            - @move is the move encoding and @key the position key reached with it; both go
+              out in one WireProtocol MOVE frame numbered by the moves sent so far
         """
         if self.conn:
-            message = '({at},{to})'.format(at=at, to=to)
-            print message
-            self.conn.send(message)
+            self.conn.sendall(WireProtocol.pack_move(self.sent, move, key))
+            self.sent += 1
 
     def close(self):
         self.server.close()
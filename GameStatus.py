@@ -0,0 +1,34 @@
+import collections
+
+class GameStatus(collections.namedtuple('GameStatus', ['turn', 'in_check', 'checkmate',
+                                                       'stalemate', 'legal_moves',
+                                                       'threefold', 'fifty_moves'])):
+    """
+    Outcome-related facts about a position, as returned by ChessGame.status()
+        - @turn is the color to move and @in_check whether its king is attacked
+        - @checkmate and @stalemate say whether @turn has lost or drawn for lack of moves
+        - @legal_moves counts the legal moves of @turn (each promotion piece counts once)
+        - @threefold is set when the position has occurred three times, and @fifty_moves
+          when fifty moves a side have passed without a capture or pawn move (unless the
+          last of them mated); both are treated as draws that end the game
+    """
+
+    __slots__ = ()
+
+    @property
+    def draw(self):
+        return self.stalemate or self.threefold or self.fifty_moves
+
+    @property
+    def game_over(self):
+        return self.checkmate or self.draw
+
+    @property
+    def winner(self):
+        """
+        Color that has won, or None
+        """
+
+        if not self.checkmate:
+            return None
+        return 'black' if self.turn == 'white' else 'white'
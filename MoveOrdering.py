@@ -0,0 +1,90 @@
+class MoveOrderer:
+    """
+    Orders moves for Search.py so that alpha-beta sees the likeliest cutoffs first
+        - the hash move from the TranspositionTable comes first
+        - then captures and promotions, most valuable victim (or promotion piece) first
+          and least valuable attacker among equal victims (MVV-LVA)
+        - then the two killer moves recorded for the same ply
+        - then the remaining quiet moves by history score: how often, weighted by depth,
+          the move has caused a cutoff anywhere in the tree
+        - killers and history persist between searches; call clear() for a fresh start
+    """
+
+    RANKS = { 'pawn': 1, 'knight': 2, 'bishop': 3, 'rook': 4, 'queen': 5, 'king': 6 }
+
+    HASH_MOVE = 1 << 30
+    CAPTURE   = 1 << 24
+    KILLER    = 1 << 22
+    HISTORY_LIMIT = 1 << 20
+
+    def __init__(self, max_ply=128):
+        self.max_ply = max_ply
+        self.clear()
+
+    def clear(self):
+        self.killers = [[0, 0] for ply in range(self.max_ply)]
+        self.history = { 'white': [0] * 4096, 'black': [0] * 4096 }
+
+    def order(self, game, moves, hash_move, ply):
+        """
+        Return @moves (encodings for the side to move in @game) sorted best first
+        """
+
+        history = self.history[game.get_turn()]
+        killers = self.killers[ply] if ply < self.max_ply else (0, 0)
+        ranks   = MoveOrderer.RANKS
+
+        def score(move):
+            if move == hash_move:
+                return MoveOrderer.HASH_MOVE
+            victim = self.captured_name(game, move)
+            if victim or move >> 12:
+                attacker = game.piece_on(move & 0x3f)
+                value    = ranks[victim] << 4 if victim else 0
+                if move >> 12:
+                    value += ranks[game.get_promotion(move)] << 4
+                return MoveOrderer.CAPTURE + value - ranks[attacker.name]
+            if move == killers[0]:
+                return MoveOrderer.KILLER + 1
+            if move == killers[1]:
+                return MoveOrderer.KILLER
+            return history[move & 0xfff]
+
+        return sorted(moves, key=score, reverse=True)
+
+    def captured_name(self, game, move):
+        """
+        Name of the piece @move captures in @game, or None
+        """
+
+        at, to = move & 0x3f, (move >> 6) & 0x3f
+        victim = game.piece_on(to)
+        if victim:
+            return victim.name
+        # a pawn moving diagonally onto an empty square captures en passant
+        if (at - to) & 7 and game.piece_on(at).name == 'pawn':
+            return 'pawn'
+        return None
+
+    def is_quiet(self, game, move):
+        return not move >> 12 and self.captured_name(game, move) is None
+
+    def record_cutoff(self, game, move, depth, ply):
+        """
+        Note that @move, made by the side to move in @game, caused a beta cutoff
+            - only quiet moves become killers or gain history
+        """
+
+        if not self.is_quiet(game, move):
+            return
+
+        if ply < self.max_ply:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1], killers[0] = killers[0], move
+
+        history = self.history[game.get_turn()]
+        history[move & 0xfff] += depth * depth
+        if history[move & 0xfff] >= MoveOrderer.HISTORY_LIMIT:
+            for color in self.history:
+                self.history[color] = [value >> 1 for value in self.history[color]]
@@ -0,0 +1,263 @@
+"""
+Streaming reader and writer for PGN (Portable Game Notation) game archives
+    - read_games yields one game at a time and write_game / append_game write one game at a
+      time, so archives of any size are handled in constant memory
+    - moves are resolved from SAN (e.g. Nbd7, exd6, e8=Q+, O-O) against the legal moves of
+      a ChessGame and stored as ChessGame move encodings
+    - comments, recursive variations, NAGs and escape lines are skipped when reading
+"""
+
+import collections
+import re
+
+import Bitboards as bits
+from ChessGame import ChessGame
+
+# @tags keeps the order of the tag pairs; @moves are move encodings from the start position
+PGNGame = collections.namedtuple('PGNGame', ['tags', 'moves', 'result'])
+
+RESULTS  = ('1-0', '0-1', '1/2-1/2', '*')
+ROSTER   = (('Event', '?'), ('Site', '?'), ('Date', '????.??.??'), ('Round', '?'),
+            ('White', '?'), ('Black', '?'), ('Result', '*'))
+LINE_LENGTH = 79
+
+SAN_LETTERS = { 'knight': 'N', 'bishop': 'B', 'rook': 'R', 'queen': 'Q', 'king': 'K' }
+SAN_NAMES   = { letter: name for name, letter in SAN_LETTERS.items() }
+
+TAG   = re.compile(r'\[\s*(\w+)\s*"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN = re.compile(r'\s*(1-0|0-1|1/2-1/2|\*|\d+\.+|\$\d+|[{}();]|[^\s{}();$]+)')
+SAN   = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQnbrq]))?$')
+
+def square_name(sq):
+    x, y = bits.coords(sq)
+    return 'abcdefgh'[y] + str(x + 1)
+
+def start_position(tags):
+    """
+    ChessGame at the start of a game: the standard setup, or the FEN tag if there is one
+    """
+
+    if 'FEN' in tags:
+        return ChessGame.from_fen(tags['FEN'])
+    return ChessGame()
+
+def move_to_san(game, move, legal=None):
+    """
+    SAN for the encoded @move in @game's position, with + or # for check and mate
+        - @legal may pass the already generated legal moves of the position
+    """
+
+    legal = game.generate_legal_moves() if legal is None else legal
+    at, to = move & 0x3f, (move >> 6) & 0x3f
+    piece  = game.piece_on(at)
+
+    if piece.name == 'king' and abs(to - at) == 2:
+        san = 'O-O' if to > at else 'O-O-O'
+    elif piece.name == 'pawn':
+        san = ''
+        if (at - to) & 7:
+            san = square_name(at)[0] + 'x'
+        san += square_name(to)
+        if move >> 12:
+            san += '=' + SAN_LETTERS[game.get_promotion(move)]
+    else:
+        rivals = [other & 0x3f for other in legal
+                  if other != move and (other >> 6) & 0x3f == to and
+                  game.piece_on(other & 0x3f).name == piece.name]
+        origin = square_name(at)
+        if not rivals:
+            prefix = ''
+        elif all((sq & 7) != (at & 7) for sq in rivals):
+            prefix = origin[0]
+        elif all((sq >> 3) != (at >> 3) for sq in rivals):
+            prefix = origin[1]
+        else:
+            prefix = origin
+        capture = 'x' if game.piece_on(to) else ''
+        san = SAN_LETTERS[piece.name] + prefix + capture + square_name(to)
+
+    game.push_move(move)
+    if game.color_in_check(game.get_turn()):
+        san += '#' if not game.generate_legal_moves() else '+'
+    game.pop_move()
+    return san
+
+def san_to_move(game, san, legal=None):
+    """
+    Encoded move for @san in @game's position
+        - check marks and annotations (+ # ! ?) are ignored, 0-0 is accepted for O-O
+        - raise ValueError if @san matches no legal move or more than one
+    """
+
+    legal = game.generate_legal_moves() if legal is None else legal
+    text  = san.rstrip('+#!?')
+
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        king = [move for move in legal
+                if game.piece_on(move & 0x3f).name == 'king' and
+                abs(((move >> 6) & 0x3f) - (move & 0x3f)) == 2]
+        wanted = 1 if len(text) == 3 else -1
+        matches = [move for move in king
+                   if (((move >> 6) & 0x3f) - (move & 0x3f) > 0) == (wanted > 0)]
+    else:
+        parsed = SAN.match(text)
+        if not parsed:
+            raise ValueError('not a SAN move: {0!r}'.format(san))
+        letter, from_file, from_rank, target, promotion = parsed.groups()
+        name = SAN_NAMES[letter] if letter else 'pawn'
+        to   = (int(target[1]) - 1) * 8 + 'abcdefgh'.index(target[0])
+        flag = 0
+        if promotion:
+            flag = ChessGame.PROMOTIONS.index(SAN_NAMES[promotion.upper()])
+
+        matches = []
+        for move in legal:
+            at = move & 0x3f
+            if ((move >> 6) & 0x3f != to or move >> 12 != flag or
+                game.piece_on(at).name != name):
+                continue
+            if from_file and 'abcdefgh'[at & 7] != from_file:
+                continue
+            if from_rank and str((at >> 3) + 1) != from_rank:
+                continue
+            matches.append(move)
+
+    if len(matches) != 1:
+        raise ValueError('{0} move: {1!r}'.format('ambiguous' if matches else 'illegal', san))
+    return matches[0]
+
+def read_games(source):
+    """
+    Yield a PGNGame for each game in @source, a path or an open file
+        - every move is checked against the legal moves as the game is replayed
+        - a malformed game raises ValueError naming the line it was found on
+    """
+
+    if isinstance(source, str):
+        with open(source) as lines:
+            for item in read_games(lines):
+                yield item
+        return
+
+    tags, moves, game = collections.OrderedDict(), [], None
+    in_comment, variations = False, 0
+
+    for number, line in enumerate(source, 1):
+        if line.startswith('%'):
+            continue
+
+        if not in_comment and not variations:
+            stripped = line.strip()
+            if stripped.startswith('['):
+                if game is not None:
+                    # a new tag section without a result ends the previous game
+                    yield PGNGame(tags, moves, tags.get('Result', '*'))
+                    tags, moves, game = collections.OrderedDict(), [], None
+                for name, value in TAG.findall(stripped):
+                    tags[name] = value.replace('\\"', '"').replace('\\\\', '\\')
+                continue
+
+        pos = 0
+        while pos < len(line):
+            if in_comment:
+                end = line.find('}', pos)
+                if end < 0:
+                    break
+                in_comment, pos = False, end + 1
+                continue
+
+            token = TOKEN.match(line, pos)
+            if not token:
+                break
+            pos, text = token.end(), token.group(1)
+
+            if text == '{':
+                in_comment = True
+            elif text == ';':
+                break
+            elif text == '(':
+                variations += 1
+            elif text == ')':
+                variations = max(0, variations - 1)
+            elif variations or text[0] == '$' or text.endswith('.'):
+                # inside a variation, a NAG or a move number
+                continue
+            elif text in RESULTS:
+                tags.setdefault('Result', text)
+                yield PGNGame(tags, moves, text)
+                tags, moves, game = collections.OrderedDict(), [], None
+            else:
+                try:
+                    if game is None:
+                        game = start_position(tags)
+                    move = san_to_move(game, text)
+                except ValueError as error:
+                    raise ValueError('line {0}: {1}'.format(number, error))
+                game.push_move(move)
+                moves.append(move)
+
+    if game is not None:
+        yield PGNGame(tags, moves, tags.get('Result', '*'))
+
+def replay(pgn_game):
+    """
+    ChessGame at the end of @pgn_game
+    """
+
+    game = start_position(pgn_game.tags)
+    for move in pgn_game.moves:
+        game.push_move(move)
+    return game
+
+def write_game(out, moves, tags=None, result='*'):
+    """
+    Write one game to the open file @out in PGN export format
+        - @moves are move encodings from the start position, which is the standard setup
+          unless @tags holds a FEN tag
+        - the seven tag roster comes first, filled with ? where @tags has no value
+        - movetext lines are kept within LINE_LENGTH characters
+    """
+
+    tags = collections.OrderedDict(tags or ())
+    tags['Result'] = result
+    for name, default in ROSTER:
+        value = tags.get(name, default)
+        out.write('[{0} "{1}"]\n'.format(name, _escape(value)))
+    for name, value in tags.items():
+        if name not in dict(ROSTER):
+            out.write('[{0} "{1}"]\n'.format(name, _escape(value)))
+    out.write('\n')
+
+    game = start_position(tags)
+    fullmove = int(game.to_fen().split()[-1])
+    line = ''
+    for ply, move in enumerate(moves):
+        token = move_to_san(game, move)
+        if game.get_turn() == ChessGame.WHITE:
+            token = '{0}. {1}'.format(fullmove, token)
+        else:
+            if ply == 0:
+                token = '{0}... {1}'.format(fullmove, token)
+            fullmove += 1
+        game.push_move(move)
+
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            out.write(line + '\n')
+            line = ''
+        line = line + ' ' + token if line else token
+
+    if line and len(line) + 1 + len(result) > LINE_LENGTH:
+        out.write(line + '\n')
+        line = ''
+    out.write((line + ' ' + result if line else result) + '\n\n')
+
+def append_game(path, moves, tags=None, result='*'):
+    """
+    Append one finished game to the PGN archive at @path; see write_game
+    """
+
+    with open(path, 'a') as out:
+        write_game(out, moves, tags, result)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
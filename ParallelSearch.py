@@ -0,0 +1,166 @@
+import multiprocessing
+import time
+import Queue
+
+from ChessGame          import ChessGame
+from MoveOrdering       import MoveOrderer
+from Search             import Search
+from TranspositionTable import TranspositionTable
+
+def _search_worker(index, position, keys, root_moves, budget, table_mb, stop, results):
+    """
+    Body of one worker process: rebuild the position from its Position snapshot and the
+    @keys of the positions before it (so repetitions of them score as draws) and search
+    @root_moves, reporting each completed iteration as (index, depth, score, move)
+    and finally (index, None, (nodes, qnodes), None)
+    """
+
+    game = ChessGame()
+    game.restore(position, keys)
+    time_limit, node_limit, max_depth = budget
+
+    def report(depth, score, move):
+        results.put((index, depth, score, move))
+
+    search = Search(game, time_limit, node_limit, max_depth,
+                    TranspositionTable(table_mb), stop=stop, report=report)
+    try:
+        search.run(root_moves)
+    finally:
+        results.put((index, None, (search.nodes, search.qnodes), None))
+
+class ParallelSearch:
+    """
+    Search that splits the root moves across worker processes, used by AIPlayer.py
+        - root moves are ordered once and dealt round-robin to @workers processes, each
+          running its own iterative deepening Search (with its own @table_mb table) over
+          its share; @node_limit is divided evenly between them
+        - positions are sent to workers as ChessGame.snapshot Positions, along with the
+          recent_keys that repetitions are looked for in
+        - when the time runs out a shared Event stops every worker; workers that have not
+          stopped GRACE seconds later are terminated
+        - moves are compared at the deepest iteration every worker completed, not counting
+          workers that stopped deepening because their whole share scored as forced mates;
+          their last results stand at any depth
+        - with @workers=1 the search runs in this process with @table and @orderer, and
+          is deterministic under a node or depth budget
+        - setting @stop, a threading Event, ends the search early like running out of time
+        - exposes nodes, qnodes, depth, score and best_move like Search
+    """
+
+    GRACE = 0.5
+    POLL  = 0.1
+
+    def __init__(self, game, workers=2, time_limit=None, node_limit=None, max_depth=64,
+                 table_mb=16, table=None, orderer=None, stop=None):
+        self.game       = game
+        self.workers    = max(1, workers)
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth  = max_depth
+        self.table_mb   = table_mb
+        self.table      = table
+        self.orderer    = orderer
+        self.stop       = stop
+
+        self.nodes      = 0
+        self.qnodes     = 0
+        self.depth      = 0
+        self.score      = None
+        self.best_move  = None
+
+    def run(self):
+        """
+        Search the game's position; return the best move encoding or None if there are no
+        legal moves
+        """
+
+        moves = self.game.generate_legal_moves()
+        if self.workers == 1 or len(moves) <= 1:
+            return self._run_here()
+
+        workers = min(self.workers, len(moves))
+        moves   = MoveOrderer().order(self.game, moves, 0, 0)
+        shares  = [moves[i::workers] for i in range(workers)]
+
+        node_limit = None
+        if self.node_limit is not None:
+            node_limit = max(1, self.node_limit // workers)
+        budget   = (self.time_limit, node_limit, self.max_depth)
+        position = self.game.snapshot()
+        keys     = self.game.recent_keys()
+        stop     = multiprocessing.Event()
+        results  = multiprocessing.Queue()
+
+        processes = [multiprocessing.Process(target=_search_worker,
+                                             args=(i, position, keys, share, budget,
+                                                   self.table_mb, stop, results))
+                     for i, share in enumerate(shares)]
+        for process in processes:
+            process.daemon = True
+            process.start()
+
+        iterations = [dict() for share in shares]
+        try:
+            self._collect(processes, results, stop, iterations)
+        finally:
+            stop.set()
+            for process in processes:
+                process.join(ParallelSearch.GRACE)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+
+        self.best_move = moves[0]
+        mates  = [bool(done) and abs(done[max(done)][0]) >= Search.MATE - self.max_depth
+                  for done in iterations]
+        depths = [max(done) if done else 0 for done, mate in zip(iterations, mates)
+                  if not mate]
+        self.depth = min(depths) if depths else max(max(done) for done in iterations)
+        if self.depth:
+            finals = [done[min(self.depth, max(done))] for done in iterations]
+            self.score, self.best_move = max(finals, key=lambda final: final[0])
+        return self.best_move
+
+    def _run_here(self):
+        search = Search(self.game, self.time_limit, self.node_limit, self.max_depth,
+                        self.table, self.orderer, stop=self.stop)
+        move = search.run()
+        self.nodes, self.qnodes, self.depth = search.nodes, search.qnodes, search.depth
+        self.score, self.best_move = search.score, search.best_move
+        return move
+
+    def _collect(self, processes, results, stop, iterations):
+        """
+        Gather worker reports until every worker is done, stopping them all once the time
+        limit has passed or self.stop was set (terminating them GRACE seconds later)
+        """
+
+        deadline = None
+        if self.time_limit is not None:
+            deadline = time.time() + self.time_limit
+
+        self.nodes, self.qnodes = 0, 0
+        running = len(processes)
+        while running:
+            if self.stop is not None and self.stop.is_set() and not stop.is_set():
+                deadline = time.time()
+            if deadline is not None and time.time() >= deadline:
+                if stop.is_set():
+                    return
+                stop.set()
+                deadline = time.time() + ParallelSearch.GRACE
+
+            try:
+                index, depth, score, move = results.get(True, ParallelSearch.POLL)
+            except Queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    return
+                continue
+
+            if depth is None:
+                running -= 1
+                self.nodes  += score[0]
+                self.qnodes += score[1]
+            else:
+                iterations[index][depth] = (score, move)
@@ -0,0 +1,133 @@
+"""
+Perft: count the leaves of the legal move tree of a position to a fixed depth
+    - leaf counts for standard positions are well known, so any difference points at a
+      move generation bug; the nodes per second figure is our move generation benchmark
+    - divide mode breaks the count down by root move, to narrow down where a count goes
+      wrong
+    - run with: python Perft.py [--depth N] [--position NAME] [--divide] [--epd FILE]
+      [--check-every N]; the exit status is non-zero if any count differs from the known one
+    - --check-every N verifies the board's integrity after every Nth make or unmake (see
+      ChessGame.set_integrity_checks), which slows the run down accordingly
+    - an EPD file gives known counts as D1, D2, ... operations, e.g.
+      rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - ;D1 20 ;D2 400
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+
+from ChessGame import ChessGame
+from EPD       import read_epd
+
+# (name, FEN, known counts for depth 1, 2, ...)
+POSITIONS = [
+    ('initial',
+     'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+     [20, 400, 8902, 197281, 4865609, 119060324]),
+    ('kiwipete',
+     'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603, 193690690]),
+    ('position3',
+     '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238, 674624, 11030083]),
+    ('position4',
+     'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333, 15833292]),
+    ('position5',
+     'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379, 2103487, 89941194]),
+    ('position6',
+     'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594, 164075551]),
+]
+
+def perft(game, depth):
+    """
+    Number of move sequences of length @depth from the position of @game
+    """
+
+    moves = game.generate_legal_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+
+    nodes = 0
+    for move in moves:
+        game.push_move(move)
+        nodes += perft(game, depth - 1)
+        game.pop_move()
+    return nodes
+
+def divide(game, depth):
+    """
+    List (move name, perft count below it) for each legal move of @game
+    """
+
+    counts = []
+    for move in game.generate_legal_moves():
+        game.push_move(move)
+        counts.append((ChessGame.move_name(move), perft(game, depth - 1)))
+        game.pop_move()
+    return sorted(counts)
+
+def epd_positions(path):
+    """
+    Yield (name, FEN, known counts) for each position of a perft suite EPD file, reading it
+    one line at a time
+    """
+
+    for number, (game, opcodes) in enumerate(read_epd(path), 1):
+        known = []
+        while 'D{0}'.format(len(known) + 1) in opcodes:
+            known.append(int(opcodes['D{0}'.format(len(known) + 1)]))
+        yield opcodes.get('id', '#{0}'.format(number)), game.to_fen(), known
+
+def run_suite(positions, max_depth, show_divide=False, check_every=0):
+    """
+    Compare perft counts with the known ones for each position up to @max_depth
+        - return True if every count matched
+    """
+
+    passed = True
+    for name, fen, known in positions:
+        game = ChessGame.from_fen(fen)
+        game.set_integrity_checks(check_every)
+        for depth in range(1, min(max_depth, len(known)) + 1):
+            start = time.time()
+            nodes = perft(game, depth)
+            elapsed = max(time.time() - start, 1e-6)
+
+            ok = nodes == known[depth - 1]
+            passed = passed and ok
+            print('{name:<12} depth {depth}: {nodes:>10} {status:<19} {rate:>9.0f} nodes/s'.format(
+                name=name, depth=depth, nodes=nodes,
+                status='ok' if ok else 'FAIL expected {0}'.format(known[depth - 1]),
+                rate=nodes / elapsed))
+
+        if show_divide:
+            for move, count in divide(game, min(max_depth, len(known))):
+                print('    {move:<6} {count}'.format(move=move, count=count))
+
+    return passed
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Perft correctness and speed suite')
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--position', choices=[name for name, _, _ in POSITIONS])
+    parser.add_argument('--divide', action='store_true',
+                        help='break the deepest count down by root move')
+    parser.add_argument('--epd', help='run the perft suite in this EPD file instead')
+    parser.add_argument('--check-every', type=int, default=0, metavar='N',
+                        help='check board integrity after every Nth make or unmake')
+    args = parser.parse_args(argv[1:])
+
+    if args.epd:
+        positions = epd_positions(args.epd)
+    else:
+        positions = [position for position in POSITIONS
+                     if args.position in (None, position[0])]
+    return 0 if run_suite(positions, args.depth, args.divide, args.check_every) else 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
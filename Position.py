@@ -0,0 +1,48 @@
+class Position(object):
+    """
+    Immutable snapshot of a ChessGame position, made by ChessGame.snapshot() and put back
+    with ChessGame.restore()
+        - board is a 64 character string of piece letters by square index (upper case for
+          white, '.' for an empty square); turn is the color to move, castling the rights
+          mask (see AttackTables.py) and en_passant the square a pawn skipped or None
+        - key is the position's Zobrist key and serves as its hash; equality compares the
+          key before anything else, so unequal positions are told apart in one comparison
+        - halfmoves and fullmoves are carried along for restore() but take no part in
+          equality or hashing
+        - small and picklable, for caches, worker processes and the network
+    """
+
+    __slots__ = ('board', 'turn', 'castling', 'en_passant', 'halfmoves', 'fullmoves', 'key')
+
+    def __init__(self, board, turn, castling, en_passant, halfmoves, fullmoves, key):
+        for name, value in zip(Position.__slots__, (board, turn, castling, en_passant,
+                                                    halfmoves, fullmoves, key)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Position is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Position is immutable')
+
+    def __reduce__(self):
+        return Position, tuple(getattr(self, name) for name in Position.__slots__)
+
+    def __eq__(self, other):
+        if not isinstance(other, Position):
+            return NotImplemented
+        return (self.key == other.key and self.board == other.board and
+                self.turn == other.turn and self.castling == other.castling and
+                self.en_passant == other.en_passant)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return 'Position({0!r}, {1!r}, {2!r}, {3!r}, {4!r}, {5!r}, {6:#x})'.format(
+            self.board, self.turn, self.castling, self.en_passant, self.halfmoves,
+            self.fullmoves, self.key)
@@ -0,0 +1,323 @@
+import time
+
+import Evaluation
+from MoveOrdering       import MoveOrderer
+from TranspositionTable import TranspositionTable
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time or node budget runs out
+    """
+    pass
+
+class Search:
+    """
+    Negamax alpha-beta search over a ChessGame instance, used by AIPlayer.py
+        - iterative deepening: depth 1, 2, ... until the budget runs out, so a best move
+          from the last completed depth is always available
+        - @time_limit is in seconds and @node_limit counts positions visited; either may be
+          None. The budget is only checked every CHECK_EVERY nodes
+        - scores are in centipawns from the point of view of the side to move
+        - the game is searched in place with push_move/pop_move and is left as it was found
+        - results are shared through @table, a TranspositionTable; pass the same table to
+          successive searches to reuse them
+        - moves are tried in the order given by @orderer, a MoveOrderer; with
+          @ordering=False only the hash move is moved to the front
+        - @stop is an optional threading/multiprocessing Event; setting it ends the search
+          as if the budget had run out
+        - @report, if given, is called as report(depth, score, move) after each completed
+          iteration
+        - a position that repeats one earlier in the game or the search, or that the
+          fifty-move rule has reached, scores as a draw
+        - with @quiescence (the default) the leaves are not evaluated as they stand:
+          captures are played out until the position is quiet, skipping captures that
+          lose material by static exchange evaluation (ChessGame.see) or that could not
+          lift the score to alpha even with DELTA_MARGIN to spare. Positions visited this
+          way are counted in qnodes as well as nodes
+        - with @null_move (the default) a side that is not in check first tries passing
+          its turn in a search reduced by NULL_REDUCTION plies; if even that fails high
+          the node is cut off. A side with only its king and pawns never passes, since
+          that is where having to move (zugzwang) is most likely to be the deciding factor
+        - with @late_move_reductions (the default) quiet moves tried after the first
+          LMR_FULL_MOVES are searched one ply shallower with a null window, and searched
+          again in full only if they beat alpha
+        - null_cutoffs, reductions and researches count how often each of these applied
+    """
+
+    MATE         = 100000
+    MAX_PLY      = 128
+    INFINITY     = MATE + 1
+    CHECK_EVERY  = 1024
+    DELTA_MARGIN = 200
+
+    NULL_REDUCTION = 2
+    NULL_MIN_DEPTH = 3
+    LMR_FULL_MOVES = 3
+    LMR_MIN_DEPTH  = 3
+
+    def __init__(self, game, time_limit=None, node_limit=None, max_depth=64,
+                 table=None, orderer=None, ordering=True, stop=None, report=None,
+                 quiescence=True, null_move=True, late_move_reductions=True):
+        self.game       = game
+        self.table      = table if table is not None else TranspositionTable()
+        self.orderer    = orderer if orderer is not None else MoveOrderer()
+        self.ordering   = ordering
+        self.stop       = stop
+        self.report     = report
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth  = max_depth
+        self.quiescence = quiescence
+        self.null_move  = null_move
+        self.late_move_reductions = late_move_reductions
+
+        self.nodes      = 0
+        self.qnodes     = 0
+        self.null_cutoffs = 0
+        self.reductions = 0
+        self.researches = 0
+        self.depth      = 0
+        self.score      = None
+        self.best_move  = None
+        self.deadline   = None
+
+    def run(self, root_moves=None):
+        """
+        Search until the budget is spent or @max_depth is completed
+            - return the best move found as an encoding (see ChessGame.encode_move),
+              or None if the side to move has no legal moves
+            - @root_moves restricts the search to some of the legal moves
+        """
+
+        self.nodes    = 0
+        self.qnodes   = 0
+        self.null_cutoffs = self.reductions = self.researches = 0
+        self.deadline = None
+        if self.time_limit is not None:
+            self.deadline = time.time() + self.time_limit
+
+        moves = self.game.generate_legal_moves()
+        if root_moves is not None:
+            moves = [move for move in moves if move in root_moves]
+        if not moves:
+            return None
+
+        self.table.new_search()
+        entry = self.table.probe(self.game.position_key())
+        moves = self._order(moves, entry[3] if entry else 0, 0)
+
+        self.best_move = moves[0]
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self._search_root(moves, depth)
+            except SearchTimeout:
+                break
+
+            self.depth, self.score, self.best_move = depth, score, move
+            if self.report:
+                self.report(depth, score, move)
+            if abs(score) >= Search.MATE - self.max_depth:
+                break
+
+            # the previous iteration's best move is the most likely best move next time
+            moves.remove(move)
+            moves.insert(0, move)
+
+        return self.best_move
+
+    def _search_root(self, moves, depth):
+        alpha, beta = -Search.INFINITY, Search.INFINITY
+        best_move   = moves[0]
+        for move in moves:
+            self.game.push_move(move)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, 1)
+            finally:
+                self.game.pop_move()
+
+            if score > alpha:
+                alpha, best_move = score, move
+
+        self.table.store(self.game.position_key(), depth, TranspositionTable.EXACT,
+                         alpha, best_move)
+        return alpha, best_move
+
+    def _negamax(self, depth, alpha, beta, ply, allow_null=True):
+        if depth <= 0 and self.quiescence:
+            return self._quiesce(alpha, beta, ply)
+
+        self._count_node()
+        if self.game.is_repetition() or self.game.halfmove_clock() >= 100:
+            return 0
+
+        if depth <= 0:
+            return self.evaluate()
+
+        key   = self.game.position_key()
+        entry = self.table.probe(key)
+        hash_move = 0
+        if entry:
+            entry_depth, bound, score, hash_move = entry
+            if entry_depth >= depth:
+                score = self._score_from_table(score, ply)
+                if (bound == TranspositionTable.EXACT or
+                    (bound == TranspositionTable.LOWER and score >= beta) or
+                    (bound == TranspositionTable.UPPER and score <= alpha)):
+                    return score
+
+        turn     = self.game.get_turn()
+        in_check = self.game.color_in_check(turn)
+        if (self.null_move and allow_null and not in_check and
+            depth >= Search.NULL_MIN_DEPTH and abs(beta) < Search.MATE - Search.MAX_PLY and
+            self.game.has_non_pawn_material(turn) and self.evaluate() >= beta):
+            self.game.push_null()
+            try:
+                score = -self._negamax(depth - 1 - Search.NULL_REDUCTION, -beta, -beta + 1,
+                                       ply + 1, False)
+            finally:
+                self.game.pop_null()
+            if score >= beta:
+                self.null_cutoffs += 1
+                return beta
+
+        moves = self.game.generate_legal_moves()
+        if not moves:
+            if in_check:
+                return -Search.MATE + ply
+            return 0
+
+        moves = self._order(moves, hash_move, ply)
+
+        reducing = (self.late_move_reductions and not in_check and
+                    depth >= Search.LMR_MIN_DEPTH)
+        bound, best_move = TranspositionTable.UPPER, 0
+        for index, move in enumerate(moves):
+            reduce = (reducing and index >= Search.LMR_FULL_MOVES and
+                      self.orderer.is_quiet(self.game, move))
+            self.game.push_move(move)
+            try:
+                if reduce and not self.game.color_in_check(self.game.get_turn()):
+                    self.reductions += 1
+                    score = -self._negamax(depth - 2, -alpha - 1, -alpha, ply + 1)
+                    if score > alpha:
+                        self.researches += 1
+                        score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+                else:
+                    score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                self.game.pop_move()
+
+            if score >= beta:
+                self.table.store(key, depth, TranspositionTable.LOWER,
+                                 self._score_to_table(beta, ply), move)
+                if self.ordering:
+                    self.orderer.record_cutoff(self.game, move, depth, ply)
+                return beta
+            if score > alpha:
+                alpha, bound, best_move = score, TranspositionTable.EXACT, move
+
+        self.table.store(key, depth, bound, self._score_to_table(alpha, ply),
+                         best_move)
+        return alpha
+
+    def _quiesce(self, alpha, beta, ply):
+        """
+        Search captures only, standing pat on the static evaluation unless in check, in
+        which case every evasion is tried
+        """
+
+        self.qnodes += 1
+        self._count_node()
+        if self.game.is_repetition() or self.game.halfmove_clock() >= 100:
+            return 0
+        if ply >= Search.MAX_PLY:
+            return self.evaluate()
+
+        stand_pat = None
+        if self.game.color_in_check(self.game.get_turn()):
+            moves = self.game.generate_legal_moves()
+            if not moves:
+                return -Search.MATE + ply
+        else:
+            stand_pat = self.evaluate()
+            if stand_pat >= beta:
+                return beta
+            alpha = max(alpha, stand_pat)
+            moves = self.game.generate_captures()
+
+        for move in self._order(moves, 0, ply):
+            if stand_pat is not None:
+                if stand_pat + self._capture_gain(move) + Search.DELTA_MARGIN <= alpha:
+                    continue
+                if self.game.see(move) < 0:
+                    continue
+
+            self.game.push_move(move)
+            try:
+                score = -self._quiesce(-beta, -alpha, ply + 1)
+            finally:
+                self.game.pop_move()
+
+            if score >= beta:
+                return beta
+            alpha = max(alpha, score)
+        return alpha
+
+    def _capture_gain(self, move):
+        """
+        Most material @move can win outright: the captured piece plus any promotion gain
+        """
+
+        values = Evaluation.VALUES
+        victim = self.orderer.captured_name(self.game, move)
+        gain   = values[victim] if victim else 0
+        if move >> 12:
+            gain += values[self.game.get_promotion(move)] - values['pawn']
+        return gain
+
+    def _order(self, moves, hash_move, ply):
+        if self.ordering:
+            return self.orderer.order(self.game, moves, hash_move, ply)
+
+        if hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+        return moves
+
+    def _score_to_table(self, score, ply):
+        """
+        Mate scores count plies from the root; the table stores them counted from the
+        position itself so that they stay valid wherever it is reached
+        """
+        if score >= Search.MATE - Search.MAX_PLY:
+            return score + ply
+        if score <= -Search.MATE + Search.MAX_PLY:
+            return score - ply
+        return score
+
+    def _score_from_table(self, score, ply):
+        if score >= Search.MATE - Search.MAX_PLY:
+            return score - ply
+        if score <= -Search.MATE + Search.MAX_PLY:
+            return score + ply
+        return score
+
+    def _count_node(self):
+        self.nodes += 1
+        if self.nodes % Search.CHECK_EVERY == 0:
+            self._check_budget()
+
+    def _check_budget(self):
+        if self.stop is not None and self.stop.is_set():
+            raise SearchTimeout()
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise SearchTimeout()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchTimeout()
+
+    def evaluate(self):
+        """
+        Static evaluation from the point of view of the side to move (see
+        ChessGame.evaluate)
+        """
+        return self.game.evaluate()
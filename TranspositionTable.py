@@ -0,0 +1,107 @@
+import array
+
+class TranspositionTable:
+    """
+    Fixed-size table of search results keyed by ChessGame.position_key, used by Search.py
+        - memory is allocated once as flat arrays and never grows
+        - each bucket has two slots: the first keeps the deepest result (unless it is left
+          over from an earlier search), the second is always overwritten
+        - an entry holds the high 32 bits of its key as a check, plus depth, score bound,
+          score and best move (see ChessGame.encode_move; 0 means no move)
+    """
+
+    EXACT = 1
+    LOWER = 2
+    UPPER = 3
+
+    def __init__(self, megabytes=16):
+        slot_size = array.array('L').itemsize * 2 + array.array('l').itemsize
+        buckets   = 1
+        while buckets * 4 * slot_size <= megabytes * 1024 * 1024:
+            buckets *= 2
+
+        self.mask   = buckets - 1
+        self.slots  = buckets * 2
+        self.checks = array.array('L', [0]) * self.slots
+        self.data   = array.array('L', [0]) * self.slots
+        self.scores = array.array('l', [0]) * self.slots
+        self.generation = 0
+        self.filled = 0
+        self.probes = 0
+        self.hits   = 0
+        self.stores = 0
+
+    def clear(self):
+        """
+        Empty the table and reset its statistics
+        """
+        for column in (self.checks, self.data, self.scores):
+            column[:] = array.array(column.typecode, [0]) * self.slots
+        self.generation = 0
+        self.filled = self.probes = self.hits = self.stores = 0
+
+    def new_search(self):
+        """
+        Mark existing entries as stale so the depth-preferred slots can be reclaimed
+        """
+        self.generation = (self.generation + 1) & 0x3f
+
+    def probe(self, key):
+        """
+        Look up @key
+            - return (depth, bound, score, move) or None if there is no entry
+        """
+
+        self.probes += 1
+        check = key >> 32
+        slot  = (key & self.mask) << 1
+        for i in (slot, slot + 1):
+            data = self.data[i]
+            if data and self.checks[i] == check:
+                self.hits += 1
+                return ((data >> 16) & 0xff, (data >> 24) & 0x3,
+                        self.scores[i], data & 0xffff)
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        """
+        Record a search result for @key, choosing a slot by the replacement scheme
+        """
+
+        self.stores += 1
+        check = key >> 32
+        slot  = (key & self.mask) << 1
+
+        old = self.data[slot]
+        if (not old or self.checks[slot] == check or
+            depth >= (old >> 16) & 0xff or (old >> 26) != self.generation):
+            i = slot
+        else:
+            i = slot + 1
+            old = self.data[i]
+
+        if not old:
+            self.filled += 1
+        self.checks[i] = check
+        self.scores[i] = score
+        self.data[i]   = ((self.generation << 26) | (bound << 24) | (depth << 16) |
+                          move)
+
+    def hit_rate(self):
+        """
+        Fraction of probes that found an entry
+        """
+        if not self.probes:
+            return 0.0
+        return float(self.hits) / self.probes
+
+    def fill(self):
+        """
+        Fraction of slots holding an entry
+        """
+        return float(self.filled) / self.slots
+
+    def stats(self):
+        return { 'slots': self.slots, 'filled': self.filled, 'fill': self.fill(),
+                 'probes': self.probes, 'hits': self.hits,
+                 'hit_rate': self.hit_rate(), 'stores': self.stores }
@@ -0,0 +1,95 @@
+import struct
+
+class ProtocolError(ValueError):
+    """
+    Raised when the bytes received from the other player cannot be framed or decoded
+    """
+    pass
+
+class WireProtocol:
+    """
+    Framed binary messages exchanged by GameServer.py and GameClient.py
+        - every frame is a HEADER (payload length, message type) followed by the payload,
+          all in network byte order, so frames can be cut out of a TCP stream however its
+          reads are split or joined
+        - a MOVE payload is (sequence, move, key): the sender's count of moves sent so far,
+          the 16 bit move encoding (see ChessGame.encode_move) and the Zobrist key of the
+          position the move leads to, which the receiver compares with its own board
+        - frames of an unknown type are skipped, so newer messages can be added without
+          breaking older peers
+    """
+
+    HEADER      = struct.Struct('!HB')
+    MOVE_FORMAT = struct.Struct('!IHQ')
+    MAX_PAYLOAD = 1024
+    RECV_SIZE   = 4096
+
+    MOVE = 1
+
+    def __init__(self):
+        self.buffer = b''
+
+    @staticmethod
+    def pack(kind, payload=b''):
+        """
+        Frame @payload as a message of type @kind
+        """
+
+        if len(payload) > WireProtocol.MAX_PAYLOAD:
+            raise ProtocolError('payload of {0} bytes is too long'.format(len(payload)))
+        return WireProtocol.HEADER.pack(len(payload), kind) + payload
+
+    @staticmethod
+    def pack_move(sequence, move, key):
+        """
+        Frame a MOVE message; see the class docstring for @sequence, @move and @key
+        """
+
+        payload = WireProtocol.MOVE_FORMAT.pack(sequence & 0xffffffff, move,
+                                                key & 0xffffffffffffffff)
+        return WireProtocol.pack(WireProtocol.MOVE, payload)
+
+    @staticmethod
+    def unpack_move(payload):
+        """
+        Get (sequence, move, key) from the payload of a MOVE frame
+        """
+
+        if len(payload) != WireProtocol.MOVE_FORMAT.size:
+            raise ProtocolError('MOVE payload of {0} bytes'.format(len(payload)))
+        return WireProtocol.MOVE_FORMAT.unpack(payload)
+
+    def feed(self, data):
+        """
+        Add @data received from the stream and return the complete frames it finishes as a
+        list of (type, payload)
+            - a partial frame is kept until the rest of it arrives
+        """
+
+        self.buffer += data
+        frames, start, size = [], 0, WireProtocol.HEADER.size
+        while len(self.buffer) - start >= size:
+            length, kind = WireProtocol.HEADER.unpack_from(self.buffer, start)
+            if length > WireProtocol.MAX_PAYLOAD:
+                raise ProtocolError('frame of {0} bytes is too long'.format(length))
+            if len(self.buffer) - start - size < length:
+                break
+            frames.append((kind, self.buffer[start + size:start + size + length]))
+            start += size + length
+
+        self.buffer = self.buffer[start:]
+        return frames
+
+    def read_moves(self, sock):
+        """
+        Generate (sequence, move, key) for each MOVE frame received on @sock until the
+        connection is closed
+        """
+
+        while True:
+            data = sock.recv(WireProtocol.RECV_SIZE)
+            if not data:
+                return
+            for kind, payload in self.feed(data):
+                if kind == WireProtocol.MOVE:
+                    yield WireProtocol.unpack_move(payload)
@@ -0,0 +1,28 @@
+"""
+64-bit Zobrist keys used by ChessGame.py to identify positions
+    - a position's key is the XOR of the keys of everything true about it, so making or
+      unmaking a move only XORs in the keys of what changed
+    - keys come from a fixed seed, so every process (and both ends of a network game)
+      computes the same key for the same position
+"""
+
+import random
+
+_rng = random.Random(20141127)
+
+def _key():
+    return _rng.getrandbits(64)
+
+# PIECES[color][name][sq]
+PIECES = { color: { name: [_key() for sq in range(64)]
+                    for name in ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king') }
+           for color in ('white', 'black') }
+
+# XORed in while black is to move
+SIDE = _key()
+
+# CASTLING[rights] for a 4 bit mask of castling rights
+CASTLING = [_key() for rights in range(16)]
+
+# EN_PASSANT[y] for the column of a pawn that may be captured en passant
+EN_PASSANT = [_key() for y in range(8)]